@@ -1,5 +1,7 @@
 import frappe
-from frappe.model.workflow import apply_workflow
+
+from medis.api.workflow_utils import apply_transition
+
 
 @frappe.whitelist()
 def transition_to_archived(invoice_name):
@@ -16,7 +18,7 @@ def transition_to_archived(invoice_name):
         return {"ok": False, "msg": f"Cannot archive invoice {invoice_name}, current state {doc.workflow_state.upper()}, should be DELIVERED or CANCELED"}
 
     try:
-        apply_workflow(doc, "Archive")
+        apply_transition(doc, "Archive")
         return {"ok": True, "msg": f"Moved to {doc.workflow_state}"}
     except Exception as e:
         frappe.log_error(title="Scan Pick Error", message=str(e))
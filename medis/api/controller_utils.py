@@ -1,23 +1,83 @@
 # my_app/api/scan_invoice.py
 import frappe
-from frappe.model.workflow import apply_workflow
+from frappe.utils import cint
+
+from medis.api.workflow_utils import DocumentClaimedError, apply_transition, claim_document
+from medis.utils import barcode_index, control_session
+from medis.utils.scan_realtime import publish_control_session
+
+# What the Controller Scanning Screen needs of an invoice
+INVOICE_PROJECTION_FIELDS = ("name", "customer", "workflow_state", "custom_picker")
+INVOICE_ITEM_PROJECTION_FIELDS = ("item_code", "item_name", "qty")
+
+def get_invoice_projection(invoice=None, doc=None, header=None):
+    """
+    The lean invoice payload of the scanning screens: INVOICE_PROJECTION_FIELDS
+    and the items' code, name and qty. Taken from `doc` when it is already
+    loaded, otherwise read with two targeted queries (one if `header` is given).
+    """
+    if doc:
+        projection = frappe._dict({field: doc.get(field) for field in INVOICE_PROJECTION_FIELDS})
+        projection["items"] = [
+            frappe._dict({field: item.get(field) for field in INVOICE_ITEM_PROJECTION_FIELDS})
+            for item in doc.items
+        ]
+        return projection
+
+    projection = header or frappe.db.get_value(
+        "Sales Invoice", invoice, INVOICE_PROJECTION_FIELDS, as_dict=True
+    )
+    if not projection:
+        return None
+    projection["items"] = frappe.get_all(
+        "Sales Invoice Item",
+        filters={"parent": projection.name, "parenttype": "Sales Invoice"},
+        fields=INVOICE_ITEM_PROJECTION_FIELDS,
+        order_by="idx asc",
+    )
+    return projection
 
 @frappe.whitelist()
-def start_invoice_controlling(invoice):
+def start_invoice_controlling(invoice, full_doc=False):
+    """
+    Start (or resume) controlling `invoice`. Returns the invoice projection, or
+    the whole document with `full_doc`, and the control session.
+    """
     try:
-        if not frappe.db.exists("Sales Invoice", invoice):
+        try:
+            # fail fast instead of queuing behind another station's save
+            header = claim_document("Sales Invoice", invoice, INVOICE_PROJECTION_FIELDS)
+        except DocumentClaimedError as e:
+            return {
+                "success": False,
+                "doc": None,
+                "msg": f"The invoice {invoice} is already claimed by {e.holder or 'another controller'}",
+            }
+        if not header:
             return {"success": False, "doc": None, "msg": f"The invoice {invoice} not found"}
 
-        doc = frappe.get_doc("Sales Invoice", invoice)
-        delivery_state = doc.workflow_state
+        delivery_state = header.workflow_state or ""
 
         if delivery_state == "Picking":
-            apply_workflow(doc, "Control Scan")
-            doc.custom_controller = frappe.session.user
-            doc.save()
-            return {"success": True, "doc": doc}
+            doc = frappe.get_doc("Sales Invoice", invoice)
+            apply_transition(doc, "Control Scan", {"custom_controller": frappe.session.user})
+            control_session.end_control_session(invoice)
+            return {
+                "success": True,
+                "doc": doc if cint(full_doc) else get_invoice_projection(doc=doc),
+                "session": control_session.start_control_session(invoice, doc.items),
+            }
         if delivery_state == "Controlling":
-            return {"success": True, "doc": doc}
+            # resume the running session, e.g. after a reload or from another station
+            if cint(full_doc):
+                doc = frappe.get_doc("Sales Invoice", invoice)
+            else:
+                doc = get_invoice_projection(header=header)
+            return {
+                "success": True,
+                "doc": doc,
+                "session": control_session.start_control_session(invoice, doc.items),
+            }
         return {
             "success": False,
             "msg": f"The invoice {invoice} is already in {delivery_state.upper()} state",
@@ -36,33 +96,103 @@ def missing_item_found(invoice):
 
 @frappe.whitelist()
 def get_item_by_barcode(barcode):
+    item = barcode_index.get_item_by_barcode(barcode)
+    if not item:
+        return {"success": False, "msg": f"Item with barcode {barcode} not found"}
 
-    barcode_row = frappe.db.get_value(
-        "Item Barcode",
-        {"barcode": barcode.strip()},
-        ["parent as item_code","parenttype as item_type"],
-        as_dict=True
-    )
+    item_code, item_name = item
+    return {"success": True, "item_code": item_code, "item_name": item_name}
 
-    if not barcode_row:
-        return {"success": False, "msg": f"Item with barcode {barcode} not found"}
+@frappe.whitelist()
+def get_barcode_index(version=None):
+    """
+    Ship the barcode -> [item_code, item_name] index to a scanner station so it
+    can resolve barcodes locally. `barcodes` is None when the station's
+    `version` is still current.
+    """
+    current_version = barcode_index.get_barcode_index_version()
+    if version == current_version:
+        return {"version": current_version, "barcodes": None}
+    return {"version": current_version, "barcodes": barcode_index.get_barcode_index()}
+
+@frappe.whitelist()
+def record_scans(invoice, barcodes, station=None):
+    """
+    Add a batch of scanned item barcodes to the control session of `invoice`.
+    Returns only the rows the batch changed, the session summary and the
+    barcodes that matched no item; the other stations on the invoice get the
+    same diff over realtime.
+    """
+    if isinstance(barcodes, str):
+        barcodes = frappe.parse_json(barcodes)
 
-    if barcode_row.item_type != "Item":
-        return {"success": False, "msg": f"Item with barcode {barcode} is not an Item"}
+    if control_session.get_expected(invoice) is None:
+        return {"success": False, "msg": f"The invoice {invoice} is not being controlled"}
 
-    item = frappe.get_doc("Item", barcode_row.item_code)
-    return {"success": True, "item_code": item.item_code, "item_name": item.item_name}
+    items, unknown = [], []
+    for barcode in barcodes:
+        item = barcode_index.get_item_by_barcode(barcode)
+        if item:
+            items.append(item)
+        else:
+            unknown.append(barcode)
+
+    if items:
+        session = control_session.record_scans(invoice, items)
+        publish_control_session(invoice, session, station)
+    else:
+        session = {"rows": [], "summary": control_session.get_control_session(invoice)["summary"]}
+    return {"success": True, "unknown": unknown, **session}
+
+@frappe.whitelist()
+def set_scanned_qty(invoice, item_code, qty, item_name=None, station=None):
+    """Overwrite the scanned quantity of one item; 0 removes it."""
+    if control_session.get_expected(invoice) is None:
+        return {"success": False, "msg": f"The invoice {invoice} is not being controlled"}
+    session = control_session.set_scanned_qty(invoice, item_code, cint(qty), item_name)
+    publish_control_session(invoice, session, station)
+    return {"success": True, **session}
+
+@frappe.whitelist()
+def get_control_session(invoice):
+    if control_session.get_expected(invoice) is None:
+        return {"success": False, "msg": f"The invoice {invoice} is not being controlled"}
+    return {"success": True, **control_session.get_control_session(invoice)}
 
 @frappe.whitelist()
-def cancel_control(invoice):
+def reset_control_session(invoice, station=None):
+    """Clear the scanned list, keeping the invoice under control."""
+    control_session.clear_scanned(invoice)
+    session = control_session.get_control_session(invoice)
+    publish_control_session(invoice, session, station)
+    return {"success": True, **session}
+
+@frappe.whitelist()
+def compare_control_session(invoice):
+    """
+    Full expected-vs-scanned comparison of the session. Flags the invoice's
+    first-attempt miss when items are missing.
+    """
+    if control_session.get_expected(invoice) is None:
+        return {"success": False, "msg": f"The invoice {invoice} is not being controlled"}
+
+    session = control_session.get_control_session(invoice)
+    if session["summary"]["missing"]:
+        missing_item_found(invoice)
+    return {"success": True, **session}
+
+@frappe.whitelist()
+def cancel_control(invoice, full_doc=False):
     try:
-        if not frappe.db.exists("Sales Invoice", invoice):
+        header = frappe.db.get_value("Sales Invoice", invoice, ["name", "workflow_state"], as_dict=True)
+        if not header:
            return {"success": False, "doc": None, "msg": f"The invoice {invoice} not found"}
-        doc = frappe.get_doc("Sales Invoice", invoice)
-        delivery_state = doc.workflow_state
+        delivery_state = header.workflow_state or ""
         if delivery_state == "Controlling":
-           apply_workflow(doc, "Picking Scan")
-           return {"success": True, "doc": doc}
+           doc = frappe.get_doc("Sales Invoice", invoice)
+           apply_transition(doc, "Picking Scan")
+           control_session.end_control_session(invoice)
+           return {"success": True, "doc": doc if cint(full_doc) else get_invoice_projection(doc=doc)}
         return {
 			"success": False,
 			"msg": f"The invoice {invoice} is in {delivery_state.upper()} state, cannot cancel control",
@@ -73,8 +203,8 @@ def cancel_control(invoice):
 @frappe.whitelist()
 def pack_invoice(invoice, packages):
     """
-    invoice   – Sales Invoice name
-    packages  – int
+    invoice   - Sales Invoice name
+    packages  - int
     """
     try:
         doc = frappe.get_doc("Sales Invoice", invoice)
@@ -83,9 +213,14 @@ def pack_invoice(invoice, packages):
 				"success": False,
 				"msg": f"The invoice {invoice} is in {doc.workflow_state.upper()} state, cannot pack",
 			}
-        doc.custom_packs = packages
-        doc.save()
-        apply_workflow(doc, "Approve")
+        session = control_session.get_expected(invoice) and control_session.get_control_session(invoice)
+        if session and not session["summary"]["complete"]:
+            return {
+                "success": False,
+                "msg": f"The scanned items of invoice {invoice} do not match the invoice, cannot pack",
+            }
+        apply_transition(doc, "Approve", {"custom_packs": packages})
+        control_session.end_control_session(invoice)
         return {"success": True, "msg": f"Invoice {invoice} packed successfully"}
     except Exception as e:
         frappe.log_error(title="Pack Invoice Error", message=str(e))
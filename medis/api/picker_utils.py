@@ -1,5 +1,7 @@
 import frappe
-from frappe.model.workflow import apply_workflow
+
+from medis.api.workflow_utils import DocumentClaimedError, apply_transition, claim_document
+
 
 @frappe.whitelist()
 def transition_to_picking(invoice_barcode):
@@ -7,19 +9,113 @@ def transition_to_picking(invoice_barcode):
     Move Sales Invoice from 'Ready For Picking' to 'Picking'
     via workflow transition 'Pick Scan'
     """
-    if not frappe.db.exists("Sales Invoice", invoice_barcode):
-        return {"ok": False, "msg": f"The invoice {invoice_barcode} not found"}
-
-    doc = frappe.get_doc("Sales Invoice", invoice_barcode)
-
-    if doc.workflow_state != "Ready For Picking":
-        return {"ok": False, "msg": f"The invoice {invoice_barcode} is already in state {doc.workflow_state.upper()}"}
-
     try:
-        apply_workflow(doc, "Picking Scan")
-        doc.custom_picker = frappe.session.user
-        doc.save()
+        doc, msg = claim_invoice_for_picking(invoice_barcode)
+        if not doc:
+            return {"ok": False, "msg": msg}
+
+        apply_transition(doc, "Picking Scan", {"custom_picker": frappe.session.user})
         return {"ok": True, "msg": f"Moved to {doc.workflow_state}"}
     except Exception as e:
         frappe.log_error(title="Scan Pick Error", message=str(e))
         return {"ok": False, "msg": str(e)}
+
+
+def claim_invoice_for_picking(invoice):
+    """
+    Lock `invoice` without waiting and load it if it can be picked. Returns the
+    document, or None and why it cannot be picked: another station holding it
+    gets an immediate answer instead of queuing behind its save.
+    """
+    try:
+        header = claim_document("Sales Invoice", invoice, ["workflow_state", "custom_picker"])
+    except DocumentClaimedError as e:
+        return None, f"The invoice {invoice} is already claimed by {e.holder or 'another picker'}"
+
+    if not header:
+        return None, f"The invoice {invoice} not found"
+    if header.workflow_state == "Picking" and header.custom_picker:
+        return None, f"The invoice {invoice} is already claimed by {header.custom_picker}"
+    if header.workflow_state != "Ready For Picking":
+        return None, f"The invoice {invoice} is already in state {(header.workflow_state or '').upper()}"
+    return frappe.get_doc("Sales Invoice", invoice), None
+
+
+@frappe.whitelist()
+def claim_picking_wave(invoices):
+    """
+    Move every 'Ready For Picking' invoice in `invoices` to 'Picking' for the
+    current user in one request. Returns a result per invoice and the wave: the
+    claimed invoices' items consolidated per item code.
+    """
+    if isinstance(invoices, str):
+        invoices = frappe.parse_json(invoices)
+
+    # one unlocked query to rule out most invoices; only the candidates are locked
+    states = dict(
+        frappe.get_all(
+            "Sales Invoice",
+            filters={"name": ["in", invoices]},
+            fields=["name", "workflow_state"],
+            as_list=True,
+        )
+    )
+
+    results = []
+    claimed = []
+    for invoice in invoices:
+        state = states.get(invoice)
+        if state is None:
+            results.append({"invoice": invoice, "ok": False, "msg": f"The invoice {invoice} not found"})
+            continue
+        if state != "Ready For Picking":
+            msg = f"The invoice {invoice} is already in state {state.upper()}"
+            results.append({"invoice": invoice, "ok": False, "msg": msg})
+            continue
+
+        try:
+            frappe.db.savepoint("medis_picking_wave")
+            doc, msg = claim_invoice_for_picking(invoice)
+            if not doc:
+                results.append({"invoice": invoice, "ok": False, "msg": msg})
+                continue
+            apply_transition(doc, "Picking Scan", {"custom_picker": frappe.session.user})
+        except Exception as e:
+            frappe.db.rollback(save_point="medis_picking_wave")
+            frappe.log_error(title="Scan Pick Error", message=str(e))
+            results.append({"invoice": invoice, "ok": False, "msg": str(e)})
+            continue
+
+        claimed.append(invoice)
+        results.append({"invoice": invoice, "ok": True, "msg": f"Moved to {doc.workflow_state}"})
+
+    return {"results": results, "wave": get_picking_wave(claimed)}
+
+
+def get_picking_wave(invoices):
+    """Items of `invoices` summed per item code, with the invoices each appears on."""
+    if not invoices:
+        return []
+
+    wave = {}
+    for item in frappe.get_all(
+        "Sales Invoice Item",
+        filters={"parent": ["in", invoices], "parenttype": "Sales Invoice"},
+        fields=["parent", "item_code", "item_name", "qty", "stock_uom"],
+        order_by="parent asc, idx asc",
+    ):
+        line = wave.setdefault(
+            item.item_code,
+            {
+                "item_code": item.item_code,
+                "item_name": item.item_name,
+                "stock_uom": item.stock_uom,
+                "qty": 0,
+                "invoices": [],
+            },
+        )
+        line["qty"] += item.qty or 0
+        if item.parent not in line["invoices"]:
+            line["invoices"].append(item.parent)
+
+    return sorted(wave.values(), key=lambda line: line["item_name"] or line["item_code"])
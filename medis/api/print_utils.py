@@ -0,0 +1,126 @@
+import base64
+from io import BytesIO
+
+import frappe
+from frappe import _
+from pypdf import PdfReader, PdfWriter
+
+from medis.api.workflow_utils import apply_transition
+from medis.utils.print_cache import render_invoice_pdf
+
+# Built bulk print batches (merged PDF and outcome), per user, until the printer
+# bridge fetched them
+PRINT_BATCH_PREFIX = "medis:print_batch:"
+PRINT_BATCH_TTL = 60 * 60
+# Pushed to the user who printed when the batch is built
+PRINT_BATCH_EVENT = "medis_print_batch_ready"
+
+
+@frappe.whitelist()
+def print_invoices(invoices, batch_id=None):
+	"""
+	Apply the 'Print' transition to every Pending invoice in `invoices` and return
+	a result per invoice. The merged PDF of the printed invoices is built in the
+	background: `batch_id`, chosen by the caller so it can listen before calling,
+	is announced with PRINT_BATCH_EVENT when it is built and fetched with
+	get_print_batch.
+	"""
+	if isinstance(invoices, str):
+		invoices = frappe.parse_json(invoices)
+	if batch_id and not batch_id.isalnum():
+		frappe.throw(_("Invalid print batch {0}").format(batch_id))
+
+	states = dict(
+		frappe.get_all(
+			"Sales Invoice",
+			filters={"name": ["in", invoices]},
+			fields=["name", "workflow_state"],
+			as_list=True,
+		)
+	)
+
+	results = []
+	printed = []
+	for invoice in invoices:
+		state = states.get(invoice)
+		if state is None:
+			results.append({"invoice": invoice, "ok": False, "msg": f"The invoice {invoice} not found"})
+			continue
+		if state != "Pending":
+			results.append(
+				{"invoice": invoice, "ok": False, "msg": f"The invoice {invoice} is in {state.upper()} state"}
+			)
+			continue
+
+		try:
+			frappe.db.savepoint("medis_print_invoice")
+			doc = frappe.get_doc("Sales Invoice", invoice)
+			# rendered by the print batch below
+			doc.flags.skip_pdf_prerender = True
+			apply_transition(doc, "Print")
+		except Exception as e:
+			frappe.db.rollback(save_point="medis_print_invoice")
+			frappe.log_error(title="Bulk Print Error", message=str(e))
+			results.append({"invoice": invoice, "ok": False, "msg": str(e)})
+			continue
+
+		printed.append(invoice)
+		results.append({"invoice": invoice, "ok": True, "msg": "Moved to Ready For Picking"})
+
+	if not printed:
+		batch_id = None
+	else:
+		batch_id = batch_id or frappe.generate_hash(length=12)
+		frappe.enqueue(
+			"medis.api.print_utils.build_print_batch",
+			queue="long",
+			job_id=f"medis-print-batch::{batch_id}",
+			enqueue_after_commit=True,
+			batch_id=batch_id,
+			invoices=printed,
+			user=frappe.session.user,
+		)
+
+	return {"results": results, "batch_id": batch_id}
+
+
+def build_print_batch(batch_id, invoices, user):
+	"""Render (or take from the PDF cache) and merge the PDFs of `invoices`, then tell `user`."""
+	writer = PdfWriter()
+	failed = []
+	for invoice in invoices:
+		try:
+			writer.append(PdfReader(BytesIO(base64.b64decode(render_invoice_pdf(invoice)))))
+		except Exception as e:
+			frappe.log_error(title="Bulk Print Error", message=frappe.get_traceback())
+			failed.append({"invoice": invoice, "msg": str(e)})
+
+	pdf_base64 = None
+	if len(failed) < len(invoices):
+		output = BytesIO()
+		writer.write(output)
+		pdf_base64 = base64.b64encode(output.getvalue()).decode()
+
+	frappe.cache().set_value(
+		_print_batch_key(user, batch_id),
+		{"pdf_base64": pdf_base64, "count": len(invoices) - len(failed), "failed": failed},
+		expires_in_sec=PRINT_BATCH_TTL,
+	)
+	frappe.publish_realtime(PRINT_BATCH_EVENT, {"batch_id": batch_id}, user=user)
+
+
+@frappe.whitelist()
+def get_print_batch(batch_id):
+	"""
+	A print batch of the current user as {"ready": True, "pdf_base64", "count",
+	"failed"} once built, {"ready": False} before. Also polled, in case the
+	realtime event is missed.
+	"""
+	batch = frappe.cache().get_value(_print_batch_key(frappe.session.user, batch_id))
+	if not batch:
+		return {"ready": False}
+	return {"ready": True, **batch}
+
+
+def _print_batch_key(user, batch_id):
+	return f"{PRINT_BATCH_PREFIX}{user}:{batch_id}"
@@ -0,0 +1,163 @@
+from collections import deque
+
+import frappe
+from frappe.utils import cint
+from redis.exceptions import LockError
+
+from medis.api import archive_utils, controller_utils, picker_utils
+
+# Per scanning station: the last client sequence number applied and the latest
+# scans with their results, so a batch replayed after a lost response is
+# answered without applying its scans twice
+SCAN_STATION_PREFIX = "medis:scan_station:"
+SCAN_STATION_LOCK_PREFIX = "medis:scan_station_lock:"
+SCAN_STATION_TTL = 7 * 24 * 60 * 60
+SCAN_STATION_RESULTS = 500
+
+# scan kind -> endpoint moving the scanned invoice
+TRANSITION_SCANS = {
+	"pick": picker_utils.transition_to_picking,
+	"archive": archive_utils.transition_to_archived,
+}
+
+
+@frappe.whitelist()
+def process_scans(station, scans):
+	"""
+	Apply the queued scans of a scanning station in sequence order, each at most
+	once. `scans` are {seq, kind, barcode} dicts, plus `invoice` for "control"
+	(item) scans. Consecutive control scans of an invoice are recorded as one
+	batch.
+
+	Returns the result of every scan by seq, and the control session diff of
+	each control batch in order. `busy` is set, with no results, when another
+	request of the station is still applying its scans.
+	"""
+	if isinstance(scans, str):
+		scans = frappe.parse_json(scans)
+	scans = sorted(scans, key=lambda scan: cint(scan["seq"]))
+
+	try:
+		# the station state is read, updated and written back by one request at a time
+		with _station_lock(station):
+			return _process_scans(station, scans)
+	except LockError:
+		return {"busy": True, "results": {}, "sessions": []}
+
+
+def _process_scans(station, scans):
+	state = _get_station_state(station)
+	results = {}
+	sessions = []
+	pending = deque()
+	for scan in scans:
+		seq = cint(scan["seq"])
+		if seq > state["last_seq"]:
+			pending.append(scan)
+		elif seq in state["results"] and state.get("scans", {}).get(seq) == _scan_key(scan):
+			# replayed after a lost response
+			results[seq] = state["results"][seq]
+		else:
+			# another scan was applied with this seq, e.g. from a tab sharing the station
+			results[seq] = {"ok": False, "msg": f"Scan {scan['barcode']} was not applied, scan it again"}
+
+	# transition scans applied since the station state was last saved
+	applied = []
+	while pending:
+		scan = pending.popleft()
+		if scan.get("kind") == "control":
+			batch = [scan]
+			while (
+				pending
+				and pending[0].get("kind") == "control"
+				and pending[0].get("invoice") == scan["invoice"]
+			):
+				batch.append(pending.popleft())
+			# control scans are recorded outside the transaction: the transitions
+			# before them are saved first and the batch is remembered at once
+			_save(station, state, applied)
+			applied = []
+			done = list(
+				zip(batch, _record_control_scans(scan["invoice"], batch, station, sessions), strict=True)
+			)
+			_remember(station, state, done)
+		elif scan.get("kind") in TRANSITION_SCANS:
+			frappe.db.savepoint("medis_process_scan")
+			result = TRANSITION_SCANS[scan["kind"]](scan["barcode"])
+			if not result["ok"]:
+				frappe.db.rollback(save_point="medis_process_scan")
+			done = [(scan, result)]
+			applied.extend(done)
+		else:
+			done = [(scan, {"ok": False, "msg": f"Unknown scan kind {scan.get('kind')}"})]
+			applied.extend(done)
+
+		for s, result in done:
+			results[cint(s["seq"])] = result
+	_save(station, state, applied)
+
+	return {"last_seq": state["last_seq"], "results": results, "sessions": sessions}
+
+
+def _record_control_scans(invoice, scans, station, sessions):
+	response = controller_utils.record_scans(invoice, [scan["barcode"] for scan in scans], station)
+	if not response["success"]:
+		return [{"ok": False, "msg": response["msg"]} for scan in scans]
+
+	sessions.append({"invoice": invoice, "rows": response["rows"], "summary": response["summary"]})
+	unknown = set(response["unknown"])
+	return [
+		{"ok": False, "msg": f"Item with barcode {scan['barcode']} not found"}
+		if scan["barcode"] in unknown
+		else {"ok": True, "msg": ""}
+		for scan in scans
+	]
+
+
+def _get_station_state(station):
+	return frappe.cache().get_value(_station_key(station)) or {"last_seq": 0, "results": {}}
+
+
+def _save(station, state, applied):
+	"""
+	Commit the transitions of `applied` in one go, then mark its scans applied.
+
+	Called before each control batch as well as at the end of the request: a
+	control batch is recorded in Redis at once and moves last_seq past the scans
+	before it, so their transitions have to be durable first. Otherwise a failure
+	later in the request would roll them back while the station reports them
+	applied.
+	"""
+	if not applied:
+		return
+	frappe.db.commit()
+	_remember(station, state, applied)
+
+
+def _remember(station, state, applied):
+	scan_keys = state.setdefault("scans", {})
+	for scan, result in applied:
+		state["results"][cint(scan["seq"])] = result
+		scan_keys[cint(scan["seq"])] = _scan_key(scan)
+	state["last_seq"] = max(state["last_seq"], *(cint(scan["seq"]) for scan, _ in applied))
+	for seq in sorted(state["results"])[:-SCAN_STATION_RESULTS]:
+		del state["results"][seq]
+		scan_keys.pop(seq, None)
+	frappe.cache().set_value(_station_key(station), state, expires_in_sec=SCAN_STATION_TTL)
+
+
+def _scan_key(scan):
+	"""What tells a replayed scan from another scan numbered the same."""
+	return (scan.get("kind"), scan.get("barcode"), scan.get("invoice"))
+
+
+def _station_key(station):
+	return f"{SCAN_STATION_PREFIX}{frappe.session.user}:{station}"
+
+
+def _station_lock(station):
+	return frappe.cache().lock(
+		frappe.cache().make_key(f"{SCAN_STATION_LOCK_PREFIX}{frappe.session.user}:{station}"),
+		timeout=120,
+		blocking_timeout=30,
+	)
@@ -0,0 +1,103 @@
+import frappe
+from frappe import _
+from frappe.model.workflow import (
+	WorkflowPermissionError,
+	WorkflowTransitionError,
+	get_transitions,
+	get_workflow,
+	has_approval_access,
+)
+from frappe.utils import cint
+
+# Who holds the row lock of a document being transitioned, so a station that
+# hits the lock can say who got there first
+CLAIM_HOLDER_PREFIX = "medis:claim_holder:"
+CLAIM_HOLDER_TTL = 60
+# Postgres lock_not_available, raised by NOWAIT as is
+PG_LOCK_NOT_AVAILABLE = "55P03"
+
+
+class DocumentClaimedError(frappe.ValidationError):
+	def __init__(self, holder=None):
+		super().__init__(holder)
+		self.holder = holder
+
+
+def claim_document(doctype, name, fields):
+	"""
+	Lock the row of `name` for the rest of the transaction without waiting for
+	it (SELECT ... FOR UPDATE NOWAIT) and return `fields` of it, or None if it
+	does not exist. Raise DocumentClaimedError, with the user holding the lock,
+	when another request already has it.
+	"""
+	key = f"{CLAIM_HOLDER_PREFIX}{doctype}:{name}"
+	# a failed lock aborts the whole transaction on Postgres
+	frappe.db.savepoint("medis_claim_document")
+	try:
+		values = frappe.db.get_value(doctype, name, fields, as_dict=True, for_update=True, wait=False)
+	except Exception as e:
+		if not is_lock_not_available(e):
+			raise
+		frappe.db.rollback(save_point="medis_claim_document")
+		raise DocumentClaimedError(frappe.cache().get_value(key))
+
+	if values:
+		frappe.cache().set_value(key, frappe.session.user, expires_in_sec=CLAIM_HOLDER_TTL)
+
+		def release():
+			frappe.cache().delete_value(key)
+
+		frappe.db.after_commit.add(release)
+		frappe.db.after_rollback.add(release)
+	return values
+
+
+def is_lock_not_available(e):
+	"""Whether `e` is a NOWAIT lock failure: mapped to QueryTimeoutError on MariaDB, raw on Postgres."""
+	return (
+		isinstance(e, frappe.QueryTimeoutError)
+		or getattr(e, "pgcode", None) == PG_LOCK_NOT_AVAILABLE
+		or frappe.db.is_timedout(e)
+	)
+
+
+def apply_transition(doc, action, values=None):
+	"""
+	Apply the workflow `action` to `doc` and set `values` on it in a single
+	validated save, submit or cancel.
+
+	Does the same checks as frappe's apply_workflow, but on the document as
+	loaded by the caller (no reload) and with the side fields (custom_picker,
+	custom_packs, ...) written in the same save instead of a second one. The
+	values are set first, so transition conditions can depend on them.
+	"""
+	if values:
+		doc.update(values)
+
+	workflow = get_workflow(doc.doctype)
+	transition = next((t for t in get_transitions(doc, workflow) if t.action == action), None)
+	if not transition:
+		frappe.throw(_("Not a valid Workflow Action"), WorkflowTransitionError)
+
+	if not has_approval_access(frappe.session.user, doc, transition):
+		frappe.throw(_("Self approval is not allowed"), WorkflowPermissionError)
+
+	doc.set(workflow.workflow_state_field, transition.next_state)
+	next_state = next(state for state in workflow.states if state.state == transition.next_state)
+	if next_state.update_field:
+		doc.set(next_state.update_field, next_state.update_value)
+
+	new_docstatus = cint(next_state.doc_status)
+	if doc.docstatus == 0 and new_docstatus == 0:
+		doc.save()
+	elif doc.docstatus == 0 and new_docstatus == 1:
+		doc.submit()
+	elif doc.docstatus == 1 and new_docstatus == 1:
+		doc.save()
+	elif doc.docstatus == 1 and new_docstatus == 2:
+		doc.cancel()
+	else:
+		frappe.throw(_("Illegal Document Status for {0}").format(next_state.state))
+
+	doc.add_comment("Workflow", _(next_state.state))
+	return doc
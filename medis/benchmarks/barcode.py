@@ -0,0 +1,102 @@
+"""
+Barcode rendering benchmark.
+
+Run on a bench site with:
+
+	bench --site <site> execute medis.benchmarks.barcode.run --kwargs "{'count': 500}"
+	bench --site <site> execute medis.benchmarks.barcode.run_print --kwargs "{'count': 100}"
+"""
+
+import base64
+import time
+from io import BytesIO
+
+import frappe
+from PIL import Image
+
+from medis.utils import barcode_utils
+
+
+def run(count=200):
+	"""Print renders per second for the legacy path, a cold render and a cache hit."""
+	docnames = [f"SI-BENCH-{i:05d}" for i in range(count)]
+
+	results = {
+		"count": count,
+		"legacy_per_pixel": _rate(_render_legacy, docnames),
+		"vectorized_render": _rate(barcode_utils.render_barcode_png, docnames),
+		"svg_render": _rate(barcode_utils.render_barcode_svg, docnames),
+	}
+
+	for docname in docnames:
+		frappe.cache().delete_value(barcode_utils.get_barcode_cache_key(docname))
+	barcode_utils._barcode_lru.clear()
+	results["cold_cache"] = _rate(_generate, docnames)
+
+	barcode_utils._barcode_lru.clear()
+	results["redis_hit"] = _rate(_generate, docnames)
+	results["lru_hit"] = _rate(_generate, docnames)
+
+	return results
+
+
+def run_print(count=100, print_format="Medis Split Invoice"):
+	"""
+	Render the latest `count` submitted invoices with PNG and with SVG barcodes and
+	print the total HTML payload and wkhtmltopdf time for each mode.
+	"""
+	from frappe.utils.pdf import get_pdf
+
+	names = frappe.get_all(
+		"Sales Invoice", filters={"docstatus": 1}, pluck="name", order_by="creation desc", limit=count
+	)
+	previous_format = frappe.conf.get("medis_barcode_format")
+	results = {"invoices": len(names)}
+
+	try:
+		for output_format in barcode_utils.OUTPUT_FORMATS:
+			frappe.conf.medis_barcode_format = output_format
+			html_bytes = 0
+			pdf_seconds = 0.0
+			for name in names:
+				html = frappe.get_print("Sales Invoice", name, print_format)
+				html_bytes += len(html.encode())
+				start = time.perf_counter()
+				get_pdf(html)
+				pdf_seconds += time.perf_counter() - start
+			results[output_format] = {"html_bytes": html_bytes, "pdf_seconds": round(pdf_seconds, 2)}
+	finally:
+		frappe.conf.medis_barcode_format = previous_format
+
+	return results
+
+
+def _generate(docname):
+	return barcode_utils.generate_barcode(docname=docname)
+
+
+def _rate(fn, docnames):
+	start = time.perf_counter()
+	for docname in docnames:
+		fn(docname)
+	elapsed = time.perf_counter() - start
+	return round(len(docnames) / elapsed, 1) if elapsed else None
+
+
+def _render_legacy(docname):
+	"""The original per-pixel implementation, kept only as a baseline."""
+	CODE128 = barcode_utils.barcode.get_barcode_class("code128")
+	buffer = BytesIO()
+	CODE128(docname, writer=barcode_utils.ImageWriter()).write(buffer, barcode_utils.BARCODE_OPTIONS)
+	buffer.seek(0)
+	img = Image.open(buffer).convert("RGBA")
+	new_data = []
+	for item in img.getdata():
+		if item[0] > 240 and item[1] > 240 and item[2] > 240:
+			new_data.append((255, 255, 255, 0))
+		else:
+			new_data.append(item)
+	img.putdata(new_data)
+	buffer_out = BytesIO()
+	img.save(buffer_out, format="PNG")
+	return f"data:image/png;base64,{base64.b64encode(buffer_out.getvalue()).decode()}"
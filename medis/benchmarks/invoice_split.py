@@ -0,0 +1,147 @@
+"""
+Submit-latency benchmark for the Sales Invoice split path
+(CustomSalesInvoice.before_submit / on_submit).
+
+Run on a local bench site with:
+
+	bench --site <site> execute medis.benchmarks.invoice_split.run
+	bench --site <site> execute medis.benchmarks.invoice_split.run \\
+		--kwargs "{'sizes': [10, 100], 'output': '/tmp/split.json'}"
+
+Synthetic Items and a Customer prefixed MEDIS-BENCH are created once and kept.
+Every measured invoice is rolled back, so repeated runs leave no transactions
+behind. Output is one JSON document with a row per (lines, free_ratio) run.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.model.workflow import apply_workflow
+
+import medis
+
+BENCH_PREFIX = "MEDIS-BENCH"
+WRITE_STATEMENTS = ("insert", "update", "delete", "replace")
+
+
+def run(sizes=(10, 100, 500, 1000), free_ratios=(0, 0.1, 0.5), repeat=3, company=None, output=None):
+	company = (
+		company or frappe.defaults.get_global_default("company") or frappe.get_all("Company", pluck="name")[0]
+	)
+	customer = _get_customer()
+	item_count = max(sizes)
+	regular_items = _get_items("REG", item_count, medication_type="")
+	free_items = _get_items("MED", item_count, medication_type="Medicine")
+	frappe.db.commit()
+
+	runs = []
+	for lines in sizes:
+		for free_ratio in free_ratios:
+			for attempt in range(repeat):
+				invoice = _make_invoice(company, customer, lines, free_ratio, regular_items, free_items)
+				stats = {"queries": 0, "writes": 0, "rows_written": 0}
+
+				with _count_queries(stats):
+					start = time.perf_counter()
+					apply_workflow(invoice, "Submit")
+					seconds = time.perf_counter() - start
+
+				runs.append(
+					{
+						"lines": lines,
+						"free_ratio": free_ratio,
+						"attempt": attempt,
+						"seconds": round(seconds, 4),
+						"split_children": len(invoice.get("custom_split_children") or []),
+						**stats,
+					}
+				)
+				frappe.db.rollback()
+
+	report = {
+		"medis_version": medis.__version__,
+		"frappe_version": frappe.__version__,
+		"site": frappe.local.site,
+		"runs": runs,
+	}
+	if output:
+		with open(output, "w") as f:
+			json.dump(report, f, indent=1)
+	return report
+
+
+@contextmanager
+def _count_queries(stats):
+	"""Count every query and the rows affected by writes while the block runs."""
+	db_class = frappe.db.__class__
+	orig_sql = db_class.sql
+
+	def sql(self, query, *args, **kwargs):
+		result = orig_sql(self, query, *args, **kwargs)
+		stats["queries"] += 1
+		if str(query).lstrip().split(None, 1)[0].lower() in WRITE_STATEMENTS:
+			stats["writes"] += 1
+			stats["rows_written"] += max(self._cursor.rowcount, 0)
+		return result
+
+	db_class.sql = sql
+	try:
+		yield stats
+	finally:
+		db_class.sql = orig_sql
+
+
+def _make_invoice(company, customer, lines, free_ratio, regular_items, free_items):
+	free_lines = int(lines * free_ratio)
+	invoice = frappe.new_doc("Sales Invoice")
+	invoice.update({"company": company, "customer": customer, "update_stock": 0})
+	for i in range(lines):
+		is_free = i < free_lines
+		invoice.append(
+			"items",
+			{
+				"item_code": (free_items if is_free else regular_items)[i],
+				"qty": 1,
+				"rate": 0 if is_free else 10,
+				"is_free": int(is_free),
+			},
+		)
+	invoice.insert()
+	return invoice
+
+
+def _get_customer():
+	name = f"{BENCH_PREFIX} Customer"
+	if not frappe.db.exists("Customer", name):
+		frappe.get_doc(
+			{
+				"doctype": "Customer",
+				"customer_name": name,
+				"customer_group": frappe.db.get_value("Customer Group", {"is_group": 0}),
+				"territory": frappe.db.get_value("Territory", {"is_group": 0}),
+			}
+		).insert()
+	return name
+
+
+def _get_items(kind, count, medication_type):
+	codes = [f"{BENCH_PREFIX}-{kind}-{i:04d}" for i in range(count)]
+	existing = set(frappe.get_all("Item", filters={"name": ["in", codes]}, pluck="name"))
+	item_group = frappe.db.get_value("Item Group", {"is_group": 0})
+	for code in codes:
+		if code in existing:
+			continue
+		frappe.get_doc(
+			{
+				"doctype": "Item",
+				"item_code": code,
+				"item_name": code,
+				"item_group": item_group,
+				"stock_uom": "Nos",
+				"is_stock_item": 0,
+				"custom_medication_type": medication_type,
+			}
+		).insert()
+	return codes
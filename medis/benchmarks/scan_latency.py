@@ -0,0 +1,135 @@
+"""
+Scan-to-feedback latency of the Controller Scanning Screen, over HTTP and over
+the realtime push the other stations on the invoice receive.
+
+Needs the site's web and socketio servers running, an API key of a Controller
+user and, for the realtime path, the python-socketio client. Run with:
+
+	bench --site <site> execute medis.benchmarks.scan_latency.run \\
+		--kwargs "{'invoice': 'ACC-SINV-2025-00001', 'api_key': '...', 'api_secret': '...'}"
+
+`invoice` is only read: a draft copy of it is controlled instead, and deleted
+with its control session afterwards.
+"""
+
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+import frappe
+import requests
+from frappe.utils import get_url
+
+from medis.utils import barcode_index, control_session
+from medis.utils.scan_realtime import CONTROL_SESSION_EVENT
+
+RECORD_SCANS = "/api/method/medis.api.controller_utils.record_scans"
+
+
+def run(invoice, api_key, api_secret, scans=200, url=None):
+	"""p50/p99 milliseconds from sending one scan to its feedback, per path."""
+	url = url or get_url()
+	headers = {"Authorization": f"token {api_key}:{api_secret}"}
+	barcodes = _get_invoice_barcodes(invoice)
+	if not barcodes:
+		frappe.throw(f"No item of {invoice} has a barcode")
+
+	copy = _make_throwaway_invoice(invoice)
+	items = frappe.get_all(
+		"Sales Invoice Item", filters={"parent": copy}, fields=["item_code", "item_name", "qty"]
+	)
+	control_session.start_control_session(copy, items)
+
+	session = requests.Session()
+	session.headers.update(headers)
+	try:
+		results = {
+			"invoice": invoice,
+			"scans": scans,
+			"http": _measure_http(session, url, copy, barcodes, scans),
+			"realtime": _measure_realtime(session, url, headers, copy, barcodes, scans),
+		}
+	finally:
+		control_session.end_control_session(copy)
+		frappe.delete_doc("Sales Invoice", copy, force=True, ignore_permissions=True)
+		frappe.db.commit()
+
+	return results
+
+
+def _make_throwaway_invoice(invoice):
+	"""A draft copy of `invoice`, committed so the web and socketio servers see it."""
+	copy = frappe.copy_doc(frappe.get_doc("Sales Invoice", invoice))
+	copy.docstatus = 0
+	copy.insert(ignore_permissions=True)
+	frappe.db.commit()
+	return copy.name
+
+
+def _measure_http(session, url, invoice, barcodes, scans):
+	"""The scanning station itself: one record_scans request per barcode."""
+	latencies = []
+	for i in range(scans):
+		start = time.perf_counter()
+		response = session.post(url + RECORD_SCANS, data=_scan_payload(invoice, barcodes, i))
+		response.raise_for_status()
+		latencies.append(time.perf_counter() - start)
+	return _percentiles(latencies)
+
+
+def _measure_realtime(session, url, headers, invoice, barcodes, scans):
+	"""Another station on the invoice: from the scan being sent to its push."""
+	try:
+		import socketio
+	except ImportError:
+		return {"skipped": "python-socketio is not installed"}
+
+	namespace = f"/{frappe.local.site}"
+	parsed = urlparse(url)
+	socketio_url = f"{parsed.scheme}://{parsed.hostname}:{frappe.conf.socketio_port or 9000}"
+
+	received = threading.Event()
+	client = socketio.Client()
+	client.on(CONTROL_SESSION_EVENT, lambda data: received.set(), namespace=namespace)
+	client.connect(socketio_url, headers=headers, namespaces=[namespace], transports=["websocket"])
+	client.emit("doc_subscribe", ("Sales Invoice", invoice), namespace=namespace)
+	# let the subscription reach the server before the first scan
+	time.sleep(1)
+
+	latencies = []
+	try:
+		for i in range(scans):
+			received.clear()
+			start = time.perf_counter()
+			session.post(url + RECORD_SCANS, data=_scan_payload(invoice, barcodes, i))
+			if received.wait(timeout=5):
+				latencies.append(time.perf_counter() - start)
+	finally:
+		client.disconnect()
+
+	return {**_percentiles(latencies), "lost": scans - len(latencies)}
+
+
+def _scan_payload(invoice, barcodes, i):
+	return {"invoice": invoice, "barcodes": json.dumps([barcodes[i % len(barcodes)]])}
+
+
+def _get_invoice_barcodes(invoice):
+	item_codes = set(frappe.get_all("Sales Invoice Item", filters={"parent": invoice}, pluck="item_code"))
+	return [
+		barcode
+		for barcode, (item_code, _) in barcode_index.get_barcode_index().items()
+		if item_code in item_codes
+	]
+
+
+def _percentiles(latencies):
+	if not latencies:
+		return {"p50_ms": None, "p99_ms": None}
+	latencies = sorted(latencies)
+	return {
+		"p50_ms": round(statistics.median(latencies) * 1000, 1),
+		"p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+	}
@@ -34,7 +34,7 @@ website_context = {
 # app_include_css = "/assets/medis/css/medis.css"
 # app_include_js = "assets/medis/js/invoice_status_updater.js"
 # app_include_js = ["/assets/medis/js/desktop.js"]
-app_include_js = "/assets/medis/js/desktop.js"
+app_include_js = ["/assets/medis/js/desktop.js", "/assets/medis/js/scan_queue.js"]
 fixtures = [
     {
         "dt": "Custom Field",
@@ -138,6 +138,9 @@ doctype_list_js = {"Sales Invoice": "public/js/sales_invoice_list.js"}
 # 	"methods": "medis.utils.jinja_methods",
 # 	"filters": "medis.utils.jinja_filters"
 # }
+jinja = {
+	"methods": ["medis.utils.print_context.get_split_invoice_context"],
+}
 
 # Installation
 # ------------
@@ -145,6 +148,9 @@ doctype_list_js = {"Sales Invoice": "public/js/sales_invoice_list.js"}
 # before_install = "medis.install.before_install"
 # after_install = "medis.medis.scripts.after_install.after_install"
 
+# Warm the barcode -> item index used by the scanning screens
+after_migrate = ["medis.utils.barcode_index.build_barcode_index"]
+
 # Uninstallation
 # ------------
 
@@ -200,14 +206,38 @@ override_doctype_class = {
 doc_events = {
     "Sales Invoice": {
         "validate": "medis.sales_invoice_item_controller.sales_invoice_validate",
-        "before_save": "medis.sales_invoice_item_controller.sales_invoice_before_save",
-        "on_update": "medis.sales_invoice_item_controller.sales_invoice_on_update"
+        "on_update": "medis.sales_invoice_item_controller.sales_invoice_on_update",
+        "on_update_after_submit": "medis.utils.print_cache.on_sales_invoice_update",
+        "on_change": "medis.utils.scan_realtime.publish_invoice_state"
+    },
+    "Item": {
+        "on_update": [
+            "medis.utils.item_cache.clear_item_attributes",
+            "medis.utils.barcode_index.update_barcode_index"
+        ],
+        "on_trash": [
+            "medis.utils.item_cache.clear_item_attributes",
+            "medis.utils.barcode_index.remove_from_barcode_index"
+        ],
+        "after_rename": [
+            "medis.utils.item_cache.clear_item_attributes",
+            "medis.utils.barcode_index.clear_barcode_index"
+        ]
+    },
+    "Company": {
+        "on_update": "medis.utils.account_mapping.clear_additional_price_accounts"
     }
 }
 
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+	"daily": [
+		"medis.utils.additional_price.post_additional_price_entries"
+	],
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"medis.tasks.all"
@@ -0,0 +1,29 @@
+# Copyright (c) 2025, Marwa and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class AdditionalPriceAccount(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		company: DF.Link
+		cost_center: DF.Link | None
+		currency: DF.Link
+		expense_account: DF.Link
+		parent: DF.Data
+		parentfield: DF.Data
+		parenttype: DF.Data
+		receivable_account: DF.Link
+		sales_account: DF.Link
+
+	# end: auto-generated types
+
+	pass
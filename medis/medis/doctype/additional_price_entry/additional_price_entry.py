@@ -0,0 +1,32 @@
+# Copyright (c) 2025, Marwa and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class AdditionalPriceEntry(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		account: DF.Link | None
+		amount: DF.Currency
+		base_amount: DF.Currency
+		company: DF.Link | None
+		cost_center: DF.Link | None
+		currency: DF.Link | None
+		customer: DF.Link | None
+		invoice: DF.Link
+		journal_entry: DF.Link | None
+		posting_date: DF.Date | None
+		receivable_account: DF.Link | None
+		reversal_of: DF.Link | None
+
+	# end: auto-generated types
+
+	pass
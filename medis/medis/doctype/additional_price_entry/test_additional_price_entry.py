@@ -0,0 +1,94 @@
+# Copyright (c) 2025, Marwa and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, today
+
+from medis.api.workflow_utils import apply_transition
+from medis.utils.additional_price import (
+	ADDITIONAL_PRICE_ENTRY,
+	cancel_additional_price_entries,
+	post_additional_price_entries,
+)
+
+
+class TestAdditionalPriceEntry(FrappeTestCase):
+	def setUp(self):
+		self.invoice = create_sales_invoice(do_not_submit=True)
+		apply_transition(self.invoice, "Submit")
+		# the posting job commits per group; keep the test's changes rolled back
+		patcher = patch.object(frappe.local.db, "commit")
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def make_entry(self, amount, posting_date, customer="_Test Customer"):
+		return frappe.get_doc(
+			{
+				"doctype": ADDITIONAL_PRICE_ENTRY,
+				"invoice": self.invoice.name,
+				"customer": customer,
+				"posting_date": posting_date,
+				"company": "_Test Company",
+				"currency": "INR",
+				"amount": amount,
+				"base_amount": amount,
+				"receivable_account": "Debtors - _TC",
+				"account": "Sales - _TC",
+				"cost_center": "_Test Cost Center - _TC",
+			}
+		).insert(ignore_permissions=True)
+
+	def get_journal_entry(self, entry):
+		return frappe.db.get_value(ADDITIONAL_PRICE_ENTRY, entry.name, "journal_entry")
+
+	def test_entries_are_posted_per_customer_and_day(self):
+		day_1, day_2 = add_days(today(), -2), add_days(today(), -1)
+		first = self.make_entry(100, day_1)
+		second = self.make_entry(50, day_1)
+		other_customer = self.make_entry(30, day_1, customer="_Test Customer 1")
+		next_day = self.make_entry(20, day_2)
+
+		post_additional_price_entries()
+
+		journal_entry = self.get_journal_entry(first)
+		self.assertTrue(journal_entry)
+		self.assertEqual(self.get_journal_entry(second), journal_entry)
+		self.assertNotIn(self.get_journal_entry(other_customer), (None, journal_entry))
+		self.assertNotIn(self.get_journal_entry(next_day), (None, journal_entry))
+
+		journal_entry = frappe.get_doc("Journal Entry", journal_entry)
+		self.assertEqual(journal_entry.docstatus, 1)
+		receivable = next(row for row in journal_entry.accounts if row.account == "Debtors - _TC")
+		self.assertEqual(receivable.debit_in_account_currency, 150)
+		self.assertEqual(receivable.party, "_Test Customer")
+
+	def test_entries_of_the_posting_day_wait_for_the_next_run(self):
+		entry = self.make_entry(100, today())
+
+		post_additional_price_entries()
+
+		self.assertIsNone(self.get_journal_entry(entry))
+
+	def test_cancel_deletes_unposted_and_reverses_posted_entries(self):
+		posted = self.make_entry(100, add_days(today(), -1))
+		post_additional_price_entries()
+		unposted = self.make_entry(40, today())
+
+		cancel_additional_price_entries(self.invoice.name)
+
+		self.assertFalse(frappe.db.exists(ADDITIONAL_PRICE_ENTRY, unposted.name))
+		reversal = frappe.get_all(
+			ADDITIONAL_PRICE_ENTRY,
+			filters={"reversal_of": posted.name},
+			fields=["amount", "base_amount", "posting_date", "journal_entry"],
+		)
+		self.assertEqual(len(reversal), 1)
+		self.assertEqual(reversal[0].amount, -100)
+		self.assertEqual(reversal[0].base_amount, -100)
+		self.assertEqual(str(reversal[0].posting_date), today())
+		# posted by the next daily run, like any other entry
+		self.assertIsNone(reversal[0].journal_entry)
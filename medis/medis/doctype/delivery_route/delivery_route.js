@@ -32,6 +32,45 @@ frappe.ui.form.on("Delivery Route", {
 				},
 			};
 		});
+
+		// the invoices are assigned in the background after submit
+		if (!frm.assignment_listener) {
+			frm.assignment_listener = true;
+			frappe.realtime.on("medis_route_assignment_done", (data) => {
+				if (frm.doc && data.route === frm.doc.name) frm.reload_doc();
+			});
+		}
+	},
+	refresh(frm) {
+		if (frm.doc.docstatus !== 1) return;
+
+		const rows = frm.doc.delivery_route_item || [];
+		const pending = rows.filter((row) => row.assignment_status === "Pending").length;
+		const failed = rows.filter((row) => row.assignment_status === "Failed").length;
+		if (pending) {
+			frm.dashboard.set_headline(__("Assigning {0} invoice(s) in the background", [pending]));
+		} else if (failed) {
+			frm.dashboard.set_headline(
+				__("{0} invoice(s) could not be assigned, see Assignment Error on the rows", [failed]),
+				"red"
+			);
+		}
+
+		if (failed && !pending) {
+			frm.add_custom_button(__("Retry Failed Invoices"), () => {
+				frappe.call({
+					method: "medis.medis.doctype.delivery_route.delivery_route.retry_failed_assignments",
+					args: { route: frm.doc.name },
+					callback: (r) => {
+						frappe.show_alert({
+							message: __("Retrying {0} invoice(s)", [r.message]),
+							indicator: "blue",
+						});
+						frm.reload_doc();
+					},
+				});
+			});
+		}
 	},
 	before_workflow_action: async (frm, doc, ac) => {
 		let promise = new Promise((resolve, reject) => {
@@ -1,39 +1,73 @@
 import frappe
+from frappe import _
 from frappe.model.document import Document
-from frappe.workflow.doctype.workflow_action.workflow_action import apply_workflow
-import json
+
+from medis.api.workflow_utils import apply_transition
+
+# Invoices assigned per transaction by the background submission of a route
+ASSIGNMENT_CHUNK_SIZE = 20
+# Pushed to the route's form when its background assignment finishes
+ASSIGNMENT_DONE_EVENT = "medis_route_assignment_done"
 
 class DeliveryRoute(Document):
 
 	def before_save(self):
-		if(self.get("workflow_state") != "Ready For Delivery"): return
+		if self.get("workflow_state") != "Ready For Delivery":
+			return
 
 		current_items = {row.invoice_number for row in self.delivery_route_item if row.invoice_number}
-
-		try:
-			previous_items = set(json.loads(self.get("_last_child_rows") or "[]"))
-		except Exception:
-			previous_items = set()
-
-		self._last_child_rows = json.dumps(list(current_items))
+		before = self.get_doc_before_save()
+		previous_items = set()
+		if before:
+			previous_items = {row.invoice_number for row in before.delivery_route_item if row.invoice_number}
 
 		linked = current_items - previous_items
-		for child_name in linked:
-			child_doc = frappe.get_doc("Sales Invoice", child_name)
-			if child_doc.workflow_state != "Ready For Delivery":
-				apply_workflow(child_doc, "Prepare For Delivery")
-
 		unlinked = previous_items - current_items
-		for child_name in unlinked:
-			child_doc = frappe.get_doc("Sales Invoice", child_name)
-			if child_doc.workflow_state != "Packed":
-				apply_workflow(child_doc, "Repack")
+		if not linked and not unlinked:
+			return
+
+		states = dict(frappe.get_all(
+			"Sales Invoice",
+			filters={"name": ["in", list(linked | unlinked)]},
+			fields=["name", "workflow_state"],
+			as_list=True,
+		))
+
+		errors = []
+		for invoice in sorted(linked):
+			if states.get(invoice) != "Ready For Delivery":
+				self.transition_invoice(invoice, "Prepare For Delivery", errors)
+		for invoice in sorted(unlinked):
+			if states.get(invoice) != "Packed":
+				self.transition_invoice(invoice, "Repack", errors)
+
+		if errors:
+			frappe.throw(
+				"<br>".join(errors),
+				title=_("Could not update {0} invoice(s) of the route").format(len(errors)),
+			)
+
+	def transition_invoice(self, invoice, action, errors):
+		"""Apply `action` to `invoice`, adding the error to `errors` if it fails."""
+		frappe.db.savepoint("medis_delivery_route_invoice")
+		message_count = len(frappe.local.message_log)
+		try:
+			apply_transition(frappe.get_doc("Sales Invoice", invoice), action)
+		except Exception as e:
+			frappe.db.rollback(save_point="medis_delivery_route_invoice")
+			# reported once, with the others; messages from before the transition are kept
+			del frappe.local.message_log[message_count:]
+			errors.append(f"{invoice}: {e}")
+
+	def before_submit(self):
+		for row in self.delivery_route_item:
+			row.assignment_status = "Pending"
+			row.assignment_error = None
 
 	def on_submit(self):
-		submitted_invoices = {row.invoice_number for row in self.delivery_route_item if row.invoice_number}
-		for item in submitted_invoices:
-			invoice = frappe.get_doc("Sales Invoice", item)
-			apply_workflow(invoice, "Assign Delivery Route")
+		# the invoices are moved to Out For Delivery in the background, see
+		# assign_delivery_route_invoices
+		enqueue_invoice_assignment(self.name)
 
 	def validate_workflow(self):
 		state = self.get("workflow_state")
@@ -43,8 +77,7 @@ class DeliveryRoute(Document):
 
 				invoice = frappe.get_doc("Sales Invoice", item.invoice_number)
 				if invoice.workflow_state != "Packed":
-					apply_workflow(invoice, "Repack")
-					invoice.reload()
+					apply_transition(invoice, "Repack")
 
 		return super().validate_workflow()
 
@@ -82,8 +115,7 @@ def update_invoice_workflow_action(invoice_number, action):
         # Get the sales invoice document
         invoice = frappe.get_doc("Sales Invoice", invoice_number)
         # Apply the workflow action
-        apply_workflow(invoice, action)
-        invoice.reload()
+        apply_transition(invoice, action)
 
         return {
             "status": "success",
@@ -94,6 +126,130 @@ def update_invoice_workflow_action(invoice_number, action):
     except Exception as e:
         frappe.log_error(
             title="Invoice Workflow Update Error",
-            message=f"Failed to update workflow for invoice {invoice_number}: {str(e)}"
+            message=f"Failed to update workflow for invoice {invoice_number}: {e!s}"
         )
-        frappe.throw(f"Failed to update invoice workflow: {str(e)}")
+        frappe.throw(f"Failed to update invoice workflow: {e!s}")
+
+
+def enqueue_invoice_assignment(route):
+	frappe.enqueue(
+		"medis.medis.doctype.delivery_route.delivery_route.assign_delivery_route_invoices",
+		queue="long",
+		job_id=f"medis-delivery-route-assignment::{route}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		route=route,
+	)
+
+
+def assign_delivery_route_invoices(route):
+	"""
+	Apply "Assign Delivery Route" to the route's Pending invoices, committing
+	every ASSIGNMENT_CHUNK_SIZE invoices and reporting progress on the form.
+	Each row ends up Assigned or Failed with its error, so one bad invoice
+	neither rolls the route back nor blocks the others. A failure the row
+	savepoint cannot contain (deadlock, lost connection) marks the rows still
+	Pending as Failed, so retry_failed_assignments picks them up.
+	"""
+	try:
+		assign_pending_invoices(route)
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(
+			title="Delivery Route Assignment Error", reference_doctype="Delivery Route", reference_name=route
+		)
+		pending = [row.name for row in get_pending_assignments(route)]
+		if pending:
+			error = _("Assignment interrupted: {0}").format(e)
+			frappe.db.set_value(
+				"Delivery Route Item",
+				{"name": ["in", pending]},
+				{"assignment_status": "Failed", "assignment_error": error},
+				update_modified=False,
+			)
+		frappe.db.commit()
+
+	failed = frappe.db.count(
+		"Delivery Route Item",
+		{"parent": route, "parenttype": "Delivery Route", "assignment_status": "Failed"},
+	)
+	frappe.publish_realtime(
+		ASSIGNMENT_DONE_EVENT,
+		{"route": route, "failed": failed},
+		doctype="Delivery Route",
+		docname=route,
+	)
+
+
+def assign_pending_invoices(route):
+	# rows retried while this job runs are picked up by the next round
+	while rows := get_pending_assignments(route):
+		for start in range(0, len(rows), ASSIGNMENT_CHUNK_SIZE):
+			chunk = rows[start : start + ASSIGNMENT_CHUNK_SIZE]
+			states = dict(frappe.get_all(
+				"Sales Invoice",
+				filters={"name": ["in", [row.invoice_number for row in chunk]]},
+				fields=["name", "workflow_state"],
+				as_list=True,
+			))
+			for row in chunk:
+				assign_invoice(row, states.get(row.invoice_number))
+			frappe.db.commit()
+
+			done = start + len(chunk)
+			frappe.publish_progress(
+				done * 100 / len(rows),
+				title=_("Assigning invoices"),
+				doctype="Delivery Route",
+				docname=route,
+				description=_("{0} of {1} invoices").format(done, len(rows)),
+			)
+
+
+def get_pending_assignments(route):
+	return frappe.get_all(
+		"Delivery Route Item",
+		filters={"parent": route, "parenttype": "Delivery Route", "assignment_status": "Pending"},
+		fields=["name", "invoice_number"],
+		order_by="idx asc",
+	)
+
+
+def assign_invoice(row, workflow_state):
+	"""Assign the invoice of a Delivery Route Item row and record the outcome on the row."""
+	frappe.db.savepoint("medis_assign_delivery_route")
+	message_count = len(frappe.local.message_log)
+	try:
+		# already assigned by an earlier, interrupted run
+		if workflow_state != "Out For Delivery":
+			apply_transition(frappe.get_doc("Sales Invoice", row.invoice_number), "Assign Delivery Route")
+		values = {"assignment_status": "Assigned", "assignment_error": None}
+	except Exception as e:
+		frappe.db.rollback(save_point="medis_assign_delivery_route")
+		del frappe.local.message_log[message_count:]
+		frappe.log_error(title="Delivery Route Assignment Error", message=frappe.get_traceback())
+		values = {"assignment_status": "Failed", "assignment_error": str(e)}
+
+	frappe.db.set_value("Delivery Route Item", row.name, values, update_modified=False)
+
+
+@frappe.whitelist()
+def retry_failed_assignments(route):
+	"""Queue the route's Failed invoices for assignment again; the Assigned ones are left alone."""
+	doc = frappe.get_doc("Delivery Route", route)
+	doc.check_permission("submit")
+	if doc.docstatus != 1:
+		frappe.throw(_("Only a submitted Delivery Route assigns its invoices"))
+
+	failed = [row.name for row in doc.delivery_route_item if row.assignment_status == "Failed"]
+	if not failed:
+		return 0
+
+	frappe.db.set_value(
+		"Delivery Route Item",
+		{"name": ["in", failed]},
+		{"assignment_status": "Pending", "assignment_error": None},
+		update_modified=False,
+	)
+	enqueue_invoice_assignment(route)
+	return len(failed)
@@ -0,0 +1,8 @@
+// Copyright (c) 2025, Marwa and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Invoice Split Rule", {
+// 	refresh(frm) {
+
+// 	},
+// });
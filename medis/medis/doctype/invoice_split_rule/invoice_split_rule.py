@@ -0,0 +1,29 @@
+# Copyright (c) 2025, Marwa and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class InvoiceSplitRule(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		free_items_only: DF.Check
+		medication_category: DF.Link | None
+		medication_type: DF.Literal["", "Medicine", "Tablet", "Capsule", "Syrup", "Injection", "Other"]
+		parent: DF.Data
+		parentfield: DF.Data
+		parenttype: DF.Data
+		rule_name: DF.Data
+		storage_type: DF.Literal["", "Frozen", "Refrigerated", "Room Temperature", "Ambient"]
+		temperature: DF.Literal["", "Frozen", "Refrigerated", "Room Temperature", "Ambient"]
+
+	# end: auto-generated types
+
+	pass
@@ -0,0 +1,61 @@
+# Copyright (c) 2025, Marwa and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from medis.utils.account_mapping import clear_additional_price_accounts
+
+
+class MedisSettings(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		from medis.medis.doctype.additional_price_account.additional_price_account import (
+			AdditionalPriceAccount,
+		)
+		from medis.medis.doctype.invoice_split_rule.invoice_split_rule import InvoiceSplitRule
+
+		additional_price_accounts: DF.Table[AdditionalPriceAccount]
+		additional_price_company: DF.Link | None
+		additional_price_posting: DF.Literal["Per Invoice", "Consolidated Daily"]
+		split_in_background: DF.Check
+		split_rules: DF.Table[InvoiceSplitRule]
+
+	# end: auto-generated types
+
+	def validate(self):
+		self.validate_split_rules()
+		self.validate_additional_price_accounts()
+
+	def on_update(self):
+		clear_additional_price_accounts()
+
+	def validate_split_rules(self):
+		# child invoices are matched to their rule by name, see create_split_child_invoices
+		seen = set()
+		for row in self.split_rules:
+			rule_name = (row.rule_name or "").strip()
+			if rule_name in seen:
+				frappe.throw(
+					_("Row #{0}: Split rule {1} is already defined.").format(row.idx, frappe.bold(rule_name))
+				)
+			seen.add(rule_name)
+
+	def validate_additional_price_accounts(self):
+		seen = set()
+		for row in self.additional_price_accounts:
+			key = (row.company, row.currency)
+			if key in seen:
+				frappe.throw(
+					_("Row #{0}: Accounts for company {1} and currency {2} are already set.").format(
+						row.idx, frappe.bold(row.company), frappe.bold(row.currency)
+					)
+				)
+			seen.add(key)
@@ -2,9 +2,124 @@ import frappe
 from erpnext.accounts.doctype.sales_invoice.sales_invoice import SalesInvoice
 import frappe
 from frappe import _
-from frappe.model.workflow import apply_workflow
+from frappe.model.workflow import get_workflow_name
 from frappe.utils import flt
 
+from medis.utils.account_mapping import get_additional_price_accounts
+from medis.utils.additional_price import (
+    append_additional_price_rows,
+    cancel_additional_price_entries,
+    is_consolidated_posting,
+    record_additional_price_entry,
+)
+from medis.utils.split_rules import classify_invoice_items
+
+# Fields copied from a split parent to its child invoices, per table ("header"
+# is the Sales Invoice itself). Fields missing from the site's meta are dropped
+# once, when the copy plan is compiled.
+SPLIT_COPY_FIELDS = {
+    "header": (
+        "company",
+        "customer",
+        "customer_name",
+        "posting_date",
+        "posting_time",
+        "set_posting_time",
+        "due_date",
+        "currency",
+        "conversion_rate",
+        "selling_price_list",
+        "price_list_currency",
+        "plc_conversion_rate",
+        "customer_address",
+        "address_display",
+        "contact_person",
+        "contact_display",
+        "contact_mobile",
+        "contact_email",
+        "shipping_address_name",
+        "shipping_address",
+        "dispatch_address_name",
+        "dispatch_address",
+        "company_address",
+        "company_address_display",
+        "debit_to",
+        "project",
+        "cost_center",
+        "remarks",
+        "tc_name",
+        "terms",
+        "letter_head",
+        "select_print_heading",
+        "language",
+        "customer_group",
+        "territory",
+        "tax_category",
+        "custom_beneficiary",
+    ),
+    "items": (
+        "item_code",
+        "item_name",
+        "description",
+        "item_group",
+        "brand",
+        "qty",
+        "stock_qty",
+        "uom",
+        "conversion_factor",
+        "stock_uom",
+        "rate",
+        "price_list_rate",
+        "base_rate",
+        "base_price_list_rate",
+        "amount",
+        "base_amount",
+        "net_rate",
+        "base_net_rate",
+        "net_amount",
+        "base_net_amount",
+        "discount_percentage",
+        "discount_amount",
+        "base_discount_amount",
+        "warehouse",
+        "income_account",
+        "expense_account",
+        "cost_center",
+        "weight_per_unit",
+        "weight_uom",
+        "total_weight",
+        "batch_no",
+        "serial_no",
+        "custom_medication_type",
+        "custom_storage_type",
+    ),
+    "taxes": (
+        "charge_type",
+        "account_head",
+        "description",
+        "included_in_print_rate",
+        "included_in_paid_amount",
+        "cost_center",
+        "rate",
+        "account_currency",
+        "tax_amount",
+        "base_tax_amount",
+        "tax_amount_after_discount_amount",
+        "base_tax_amount_after_discount_amount",
+        "item_wise_tax_detail",
+    ),
+    "sales_team": (
+        "sales_person",
+        "contact_no",
+        "allocated_percentage",
+        "allocated_amount",
+        "commission_rate",
+        "incentives",
+    ),
+}
+
+_split_copy_plans = {}
+
 
 class CustomSalesInvoice(SalesInvoice):
 
@@ -31,6 +146,10 @@ class CustomSalesInvoice(SalesInvoice):
         if hasattr(self, 'custom_split_children') and self.custom_split_children:
             self._add_split_comments()
 
+    def on_cancel(self):
+        super().on_cancel()
+        cancel_additional_price_entries(self.name)
+
     def _add_split_comments(self):
         """Add system comments linking to child invoices after successful submission."""
         try:
@@ -64,82 +183,68 @@ class CustomSalesInvoice(SalesInvoice):
     def _process_invoice_split(self):
         """
         Main logic to process the invoice splitting.
-        Creates separate invoice for free medicine items and removes them from original.
+        Moves the lines matched by each split rule (Medis Settings) to their own
+        child invoice and removes them from the original.
         """
 
-        # Identify free medicine items
-        free_medicine_items, regular_items = self._separate_free_medicine_items()
+        # Classify all lines against the split rules in one pass
+        split_groups, regular_items = classify_invoice_items(self.items)
 
-        if not free_medicine_items or not regular_items:
+        if not split_groups or (not regular_items and len(split_groups) == 1):
+            # nothing to move out, or every line would move to the same invoice
             return
+        if not regular_items:
+            # every line matches a rule: the first group stays on this invoice
+            regular_items = split_groups.pop(next(iter(split_groups)))
         self._update_parent_quantities(regular_items)
 
-        # Create separate invoice for free medicine items
-        child_invoice = self._create_child_invoice(free_medicine_items)
+        if frappe.db.get_single_value("Medis Settings", "split_in_background"):
+            # Child invoices are created by a background job once this submit commits
+            self._enqueue_child_invoices(split_groups)
+            self._keep_original_items(regular_items)
+            return
+
+        # Create a separate invoice per matched rule
+        child_invoices = [
+            self._create_child_invoice(items, rule_name) for rule_name, items in split_groups.items()
+        ]
 
-        # Remove free medicine items from current invoice
+        # Remove split items from current invoice
         self._keep_original_items(regular_items)
 
         # Update references
-        self._update_parent_references([child_invoice])
+        self._update_parent_references(child_invoices)
 
         # Show alert to user about the split
-        self._show_split_alert(child_invoice, len(free_medicine_items))
+        self._show_split_alert(child_invoices, split_groups)
 
-    def _show_split_alert(self, child_invoice, free_items_count):
+    def _enqueue_child_invoices(self, split_groups):
         """
-        Show user alert about the invoice split.
+        Queue creation of the child invoices after the parent commits.
+
+        The moved lines are saved on the parent with the submit, so a failed
+        job can be run again from them (see retry_invoice_split).
 
         Args:
-            child_invoice: The created child invoice for free items
-            free_items_count: Number of free items moved
+            split_groups: {rule_name: items} removed from this invoice
         """
-        message = _(
-            "<b>Invoice Split Alert:</b><br>"
-            "{0} free medicine item(s) have been removed from this invoice and moved to a separate invoice.<br><br>"
-            "<b>New Invoice ID:</b> <a href='/app/sales-invoice/{1}' target='_blank'>{1}</a><br>"
-        ).format(free_items_count, child_invoice.name)
-
-        frappe.msgprint(
-            message,
-            title=_("Free Items Moved to Separate Invoice"),
-            indicator="blue"
+        self.custom_pending_split = frappe.as_json(
+            {
+                rule_name: [item.as_dict(no_default_fields=True) for item in items]
+                for rule_name, items in split_groups.items()
+            }
         )
+        enqueue_split_child_invoices(self.name)
 
-    def _separate_free_medicine_items(self):
+    def _show_split_alert(self, child_invoices, split_groups):
         """
-        Separate free medicine items from regular items.
+        Show user alert about the invoice split.
 
-        Returns:
-                tuple: (free_medicine_items, regular_items)
+        Args:
+            child_invoices: The created child invoices, one per rule
+            split_groups: {rule_name: items} moved to the child invoices
         """
-        free_medicine_items = []
-        regular_items = []
-
-        for item in self.items:
-            is_free = bool((item.amount or 0) == 0 or (item.net_amount or 0) == 0)
-
-            custom_med_type = ""
-
-            try:
-                item_doc = frappe.get_cached_doc("Item", item.item_code)
-                custom_med_type = item_doc.get("custom_medication_type", "")
-            except Exception as e:
-                frappe.log_error(
-                    f"Error fetching Item {item.item_code}: {str(e)}",
-                    "Sales Invoice Split",
-                )
-                custom_med_type = ""
-
-            is_medicine = str(custom_med_type).strip() == "Medicine"
-            is_free_medicine = is_free and is_medicine and item.name
-
-            if is_free_medicine:
-                free_medicine_items.append(item)
-            elif item.name:
-                regular_items.append(item)
-
-        return free_medicine_items, regular_items
+        frappe.msgprint(**get_split_alert(child_invoices, split_groups))
 
     def _keep_original_items(self, regular_items):
         """
@@ -167,218 +272,47 @@ class CustomSalesInvoice(SalesInvoice):
             count += item.qty or 0
         self.total_qty = count
 
-    def _create_child_invoice(self, items):
+    def _create_child_invoice(self, items, rule_name=None):
         """
         Create a child Sales Invoice for a group of items.
 
+        The child is built from the compiled copy plan, inserted once and then
+        submitted in place with the workflow's "Submit" target state.
+
         Args:
-                parent_doc: Original Sales Invoice document
                 items: List of items for this child invoice
-                group_key: Tuple of (  free_medicine_flag)
+                rule_name: Split rule that grouped these items
 
         Returns:
                 Sales Invoice: Created and submitted child invoice
         """
+        plan = get_split_copy_plan()
 
-
-        # Create new Sales Invoice
+        # Create new Sales Invoice with the parent's header fields
         child_doc = frappe.new_doc("Sales Invoice")
+        child_doc.update({field: self.get(field) for field in plan["header"] if self.get(field)})
 
-        # Copy base header fields from parent
-        self._copy_header_fields(child_doc)
-
-        # child_doc.name = f"{self.name}-1"
-        # child_doc.flags.name_set = True
         child_doc.custom_is_split_child = 1
         child_doc.custom_original_invoice = self.name
+        child_doc.custom_split_rule = rule_name
         child_doc.status = "Unpaid"
         child_doc.workflow_state = "Draft"
         child_doc.update_stock = self.update_stock
-        # child_doc.run_method("set_missing_values")
-        # Add items to child invoice
-        for item in items:
-            self._copy_item_to_child(item, child_doc)
-            child_doc.total_qty = (child_doc.total_qty or 0) + (item.qty or 0)
-
-        # Copy taxes if they exist
-        if self.taxes:
-            self._copy_taxes_to_child(child_doc)
+        child_doc.total_qty = sum(item.qty or 0 for item in items)
 
-        if self.sales_team:
-            self._copy_sales_team(child_doc)
+        for table, rows in (("items", items), ("taxes", self.taxes), ("sales_team", self.sales_team)):
+            fields = plan[table]
+            for row in rows or []:
+                child_doc.append(table, {field: row.get(field) for field in fields})
 
-        # Insert, save and submit the child invoice
         child_doc.insert()
-        child_doc.save()
-        # child_doc.submit()
-        apply_workflow(child_doc,"Submit")
-
-        return child_doc
-
-    def _copy_taxes_to_child(self, child_doc):
-        """
-        Copy tax entries from parent to child invoice.
-
-        Args:
-                parent_doc: Original Sales Invoice
-                child_doc: Child Sales Invoice
-        """
-        if not self.taxes:
-            return
-
-        for parent_tax in self.taxes:
-            child_tax = child_doc.append("taxes", {})
-
-            tax_fields = [
-                "charge_type",
-                "account_head",
-                "description",
-                "included_in_print_rate",
-                "included_in_paid_amount",
-                "cost_center",
-                "rate",
-                "account_currency",
-                "tax_amount",
-                "base_tax_amount",
-                "tax_amount_after_discount_amount",
-                "base_tax_amount_after_discount_amount",
-                "item_wise_tax_detail",
-            ]
-
-            for field in tax_fields:
-                if hasattr(parent_tax, field):
-                    setattr(child_tax, field, getattr(parent_tax, field, None))
-
-    def _copy_item_to_child(self, parent_item, child_doc):
-        """
-        Copy an item from parent invoice to child invoice.
-
-        Args:
-                parent_item: Sales Invoice Item from parent
-                child_doc: Child Sales Invoice document
-        """
-        child_item = child_doc.append("items", {})
-
-        # Copy all relevant item fields
-        item_fields = [
-            "item_code",
-            "item_name",
-            "description",
-            "item_group",
-            "brand",
-            "qty",
-            "stock_qty",
-            "uom",
-            "conversion_factor",
-            "stock_uom",
-            "rate",
-            "price_list_rate",
-            "base_rate",
-            "base_price_list_rate",
-            "amount",
-            "base_amount",
-            "net_rate",
-            "base_net_rate",
-            "net_amount",
-            "base_net_amount",
-            "discount_percentage",
-            "discount_amount",
-            "base_discount_amount",
-            "warehouse",
-            "income_account",
-            "expense_account",
-            "cost_center",
-            "weight_per_unit",
-            "weight_uom",
-            "total_weight",
-            "batch_no",
-            "serial_no",
-            "custom_medication_type",
-            "custom_storage_type",
-        ]
-
-        for field in item_fields:
-            if hasattr(parent_item, field):
-                setattr(child_item, field, getattr(parent_item, field, None))
 
-    def _copy_header_fields(self, child_doc):
-        """
-        Copy essential header fields from parent to child invoice.
-
-        Args:
-            child_doc: New child Sales Invoice
-        """
-        fields_to_copy = [
-            "company",
-            "customer",
-            "customer_name",
-            "posting_date",
-            "posting_time",
-            "set_posting_time",
-            "due_date",
-            "currency",
-            "conversion_rate",
-            "selling_price_list",
-            "price_list_currency",
-            "plc_conversion_rate",
-            "customer_address",
-            "address_display",
-            "contact_person",
-            "contact_display",
-            "contact_mobile",
-            "contact_email",
-            "shipping_address_name",
-            "shipping_address",
-            "dispatch_address_name",
-            "dispatch_address",
-            "company_address",
-            "company_address_display",
-            "debit_to",
-            "project",
-            "cost_center",
-            "remarks",
-            "tc_name",
-            "terms",
-            "letter_head",
-            "select_print_heading",
-            "language",
-            "customer_group",
-            "territory",
-            "tax_category",
-            "custom_beneficiary",
-        ]
+        # Same transition as apply_workflow(child_doc, "Submit"), without reloading
+        # the document that was just inserted
+        child_doc.workflow_state = get_split_submit_state()
+        child_doc.submit()
 
-        for field in fields_to_copy:
-            if hasattr(self, field) and self.get(field):
-                child_doc.set(field, self.get(field))
-
-    def _copy_sales_team(self, child_doc):
-        """
-		Copy sales team entries from parent to child invoice.
-
-		Args:
-				parent_doc: Original Sales Invoice
-				child_doc: Child Sales Invoice
-		"""
-
-        if not self.sales_team:
-            return
-
-        for parent_member in self.sales_team:
-            child_member = child_doc.append("sales_team", {})
-
-            sales_team_fields = [
-				"sales_person",
-				"contact_no",
-				"allocated_percentage",
-				"allocated_amount",
-				"commission_rate",
-				"incentives"
-			]
-
-            for field in sales_team_fields:
-                if hasattr(parent_member, field):
-                    setattr(child_member, field, getattr(parent_member, field, None))
+        return child_doc
 
     def _should_split_invoice(self):
 
@@ -406,7 +340,7 @@ class CustomSalesInvoice(SalesInvoice):
             for child_invoice in child_invoices:
                 split_ref = self.append("custom_split_children", {})
                 split_ref.sales_invoice = child_invoice.name
-                split_ref.remarks = _("Auto-split child invoice")
+                split_ref.remarks = get_split_remarks(child_invoice)
 
             # Note: Document will be saved automatically during submission process
             # Comments will be added in on_submit after successful submission
@@ -426,146 +360,200 @@ class CustomSalesInvoice(SalesInvoice):
             return
 
         invoice_currency = self.currency
-        company_currency = frappe.db.get_value("Company", "MedisPrime", "default_currency")
-
-        account_mapping = {
-			"LBP": {
-				"receivable": "411000001 - CLIENTS LBP - P",
-				"sales": "70100001 - SALES LBP - P",
-				"expense": "67510001 - NORMAL OPERATIONS LBP - P"
-			},
-			"USD": {
-				"receivable": "411000002 - CLIENTS USD - P",
-				"sales": "70100002 - SALES USD - P",
-				"expense": "67510002 - NORMAL OPERATIONS USD - P"
-			},
-			"EUR": {
-				"receivable": "411000003 - CLIENTS EUR - P",
-				"sales": "70100003 - SALES EUR - P",
-				"expense": "67510003 - NORMAL OPERATIONS EUR - P"
-			}
-    	}
-
-        if invoice_currency not in account_mapping:
-            frappe.throw(
-            _("No account mapping configured for currency {0}. Please configure accounts for this currency.").format(invoice_currency)
-            )
+        accounts = get_additional_price_accounts(self.company, invoice_currency)
+        exchange_rate = flt(self.plc_conversion_rate) or 1.0
+        cost_center = self.cost_center or accounts.cost_center
+        account = accounts.sales if flt(total_additional_price) > 0 else accounts.expense
 
-        accounts = account_mapping[invoice_currency]
+        if is_consolidated_posting():
+            # Posted later with the customer's other adjustments of the day
+            record_additional_price_entry(self, accounts, account, total_additional_price, exchange_rate, cost_center)
+            return
 
         journal_entry_doc = frappe.new_doc("Journal Entry")
 
         journal_entry_doc.voucher_type = "Journal Entry"
         journal_entry_doc.posting_date = self.posting_date
-        journal_entry_doc.company = "MedisPrime"
+        journal_entry_doc.company = accounts.company
         journal_entry_doc.user_remark = _("Journal Entry for Sales Invoice {0}").format(self.name)
 
-
-        if invoice_currency != company_currency:
-           journal_entry_doc.multi_currency = 1
-
-        exchange_rate = flt(self.plc_conversion_rate) or 1.0
-
-
-        cost_center = self.cost_center or get_default_cost_center("MedisPrime")
-        # receivable_account = self.debit_to
-
-
-        abs_amount = abs(flt(total_additional_price))
-        company_currency_amount = abs_amount * exchange_rate
-
-        if flt(total_additional_price) > 0:
-            journal_entry_doc.append("accounts", {
-				"account": accounts["receivable"],
-				"debit_in_account_currency": abs(flt(total_additional_price)),
-                "credit_in_account_currency": 0,
-                "debit": company_currency_amount,  # Company currency amount
-            	"credit": 0,
-				"party_type": "Customer",
-				"party": self.customer,
-                # "reference_type": "Sales Invoice",
-                # "reference_name": self.name,
-                "account_currency": invoice_currency,
-                "exchange_rate": exchange_rate,
-                "cost_center": cost_center,
-            	"user_remark": f"Additional price adjustment - {self.name}"
-			})
-
-            journal_entry_doc.append("accounts", {
-				"account": accounts["sales"],
-                "debit_in_account_currency": 0,
-				"credit_in_account_currency": abs(flt(total_additional_price)),
-                "debit": 0,
-            	"credit": company_currency_amount,
-                "account_currency": invoice_currency,
-				"exchange_rate": exchange_rate,
-				"cost_center": cost_center,
-				"user_remark": f"Additional price adjustment - {self.name}"
-
-			})
-        else:
-            journal_entry_doc.append("accounts", {
-				"account": accounts["receivable"],
-				"debit_in_account_currency": 0,
-				"credit_in_account_currency": abs(flt(total_additional_price)),
-				"party_type": "Customer",
-				"party": self.customer,
-				# "reference_type": "Sales Invoice",
-				# "reference_name": self.name,
-				"account_currency": invoice_currency,
-				"exchange_rate": exchange_rate,
-				"cost_center": cost_center,
-				"user_remark": f"Additional price adjustment - {self.name}"
-            })
-            journal_entry_doc.append("accounts", {
-				"account": accounts["expense"],
-				"debit_in_account_currency": abs(flt(total_additional_price)),
-				"credit_in_account_currency": 0,
-				"account_currency": invoice_currency,
-				"exchange_rate": exchange_rate,
-				"cost_center": cost_center,
-				"user_remark": f"Additional price adjustment - {self.name}"
-        })
+        if invoice_currency != accounts.company_currency:
+            journal_entry_doc.multi_currency = 1
+
+        append_additional_price_rows(
+            journal_entry_doc,
+            accounts.receivable,
+            account,
+            self.customer,
+            invoice_currency,
+            total_additional_price,
+            flt(total_additional_price) * exchange_rate,
+            cost_center,
+            f"Additional price adjustment - {self.name}",
+        )
         journal_entry_doc.insert()
         journal_entry_doc.submit()
 
 
-# def get_default_cost_center():
-#     """Get default cost center"""
-
-#     if frappe.db.exists("Selling Settings"):
-#         return frappe.db.get_single_value("Selling Settings", "cost_center") or \
-#                 frappe.db.get_value("Company", "MedisPrime", "cost_center")
+def get_split_job_id(invoice):
+    """Idempotency key of the background split job for `invoice`."""
+    return f"medis-invoice-split::{invoice}"
+
+
+def get_split_copy_plan():
+    """
+    Return {table: fields} from SPLIT_COPY_FIELDS, limited to the fields that
+    exist on this site. Compiled once per version of Sales Invoice and its child
+    tables, so customizing any of them recompiles the plan. Custom Fields and
+    Property Setters do not touch the DocType's modified, so their latest
+    modified is part of the version.
+    """
+    metas = {"header": frappe.get_meta("Sales Invoice")}
+    for table in ("items", "taxes", "sales_team"):
+        metas[table] = frappe.get_meta(metas["header"].get_field(table).options)
+
+    doctypes = [meta.name for meta in metas.values()]
+    version = (
+        frappe.local.site,
+        *(str(meta.modified) for meta in metas.values()),
+        str(frappe.db.get_value("Custom Field", {"dt": ["in", doctypes]}, "max(modified)")),
+        str(frappe.db.get_value("Property Setter", {"doc_type": ["in", doctypes]}, "max(modified)")),
+    )
+    plan = _split_copy_plans.get(version)
+    if plan is None:
+        plan = {
+            table: tuple(field for field in fields if metas[table].has_field(field))
+            for table, fields in SPLIT_COPY_FIELDS.items()
+        }
+        _split_copy_plans[version] = plan
+    return plan
+
+
+def get_split_submit_state():
+    """State the Sales Invoice workflow moves a Draft to on "Submit"."""
+    workflow = frappe.get_cached_doc("Workflow", get_workflow_name("Sales Invoice"))
+    for transition in workflow.transitions:
+        if transition.state == "Draft" and transition.action == "Submit":
+            return transition.next_state
+    frappe.throw(_("Workflow {0} has no Submit transition from Draft").format(workflow.name))
+
+
+def get_split_remarks(child_invoice):
+    if child_invoice.get("custom_split_rule"):
+        return _("Auto-split child invoice ({0})").format(child_invoice.custom_split_rule)
+    return _("Auto-split child invoice")
+
+
+def get_split_alert(child_invoices, split_groups):
+    lines = "".join(
+        _("<b>{0}:</b> {1} item(s) moved to <a href='/app/sales-invoice/{2}' target='_blank'>{2}</a><br>").format(
+            rule_name, len(split_groups[rule_name]), child_invoice.name
+        )
+        for rule_name, child_invoice in zip(split_groups, child_invoices, strict=True)
+    )
+    return {
+        "msg": _(
+            "<b>Invoice Split Alert:</b><br>"
+            "Some items have been removed from this invoice and moved to separate invoices.<br><br>"
+        )
+        + lines,
+        "title": _("Items Moved to Separate Invoices"),
+        "indicator": "blue",
+    }
+
+
+def enqueue_split_child_invoices(invoice):
+    frappe.enqueue(
+        "medis.overrides.sales_invoice.create_split_child_invoices",
+        job_id=get_split_job_id(invoice),
+        deduplicate=True,
+        enqueue_after_commit=True,
+        invoice=invoice,
+        user=frappe.session.user,
+    )
 
 
-def get_default_cost_center(company):
-    """Get default cost center from Company master"""
-    # First try to get from Company master
-    default_cost_center = frappe.db.get_value("Company", company, "cost_center")
+@frappe.whitelist()
+def retry_invoice_split(invoice):
+    """Queue the background split of `invoice` again after it failed."""
+    parent = frappe.get_doc("Sales Invoice", invoice)
+    parent.check_permission("submit")
+    if not parent.get("custom_pending_split"):
+        frappe.throw(_("Invoice {0} has no pending split").format(invoice))
+    enqueue_split_child_invoices(invoice)
+
+
+def create_split_child_invoices(invoice, user=None):
+    """
+    Background half of the invoice split, enqueued when
+    "Split Invoices in Background" is enabled in Medis Settings.
+
+    Creates the child invoices of the lines pending on the parent and clears
+    them. On failure the lines stay pending, the error is logged and `user`
+    is told; retry_invoice_split runs it again.
+    """
+    try:
+        _create_split_child_invoices(invoice, user)
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(
+            title="Sales Invoice Split", reference_doctype="Sales Invoice", reference_name=invoice
+        )
+        frappe.publish_realtime(
+            "msgprint",
+            {
+                "message": _(
+                    "The split of invoice {0} failed and its moved lines are not invoiced yet. "
+                    "Use Retry Split on the invoice once the error is fixed."
+                ).format(invoice),
+                "title": _("Invoice Split Failed"),
+                "indicator": "red",
+            },
+            user=user,
+        )
 
-    if default_cost_center:
-        return default_cost_center
 
-    # If not set in Company, try to find the main cost center for the company
-    cost_centers = frappe.get_all("Cost Center",
-        filters={"company": company, "is_group": 0},
-        fields=["name"],
-        order_by="creation asc",
-        limit_page_length=1
+def _create_split_child_invoices(invoice, user):
+    # Safe to retry: a submitted child that already exists for `invoice` and a
+    # rule is reused instead of creating a second one
+    parent = frappe.get_doc("Sales Invoice", invoice)
+    split_groups = frappe.parse_json(parent.get("custom_pending_split") or "{}")
+    if not split_groups:
+        return
+
+    existing_children = dict(
+        frappe.get_all(
+            "Sales Invoice",
+            filters={"custom_original_invoice": invoice, "custom_is_split_child": 1, "docstatus": 1},
+            fields=["custom_split_rule", "name"],
+            as_list=True,
+        )
     )
+    referenced = {ref.sales_invoice for ref in parent.custom_split_children}
 
-    if cost_centers:
-        return cost_centers[0].name
-
-    # If still not found, try to find any cost center for the company
-    cost_centers = frappe.get_all("Cost Center",
-        filters={"company": company},
-        fields=["name"],
-        limit_page_length=1
+    child_invoices = []
+    for rule_name, items in split_groups.items():
+        if existing_children.get(rule_name):
+            child_invoice = frappe.get_doc("Sales Invoice", existing_children[rule_name])
+        else:
+            child_invoice = parent._create_child_invoice([frappe._dict(item) for item in items], rule_name)
+        child_invoices.append(child_invoice)
+
+        if child_invoice.name not in referenced:
+            # allow_on_submit child table: insert the row without re-saving the parent
+            parent.append(
+                "custom_split_children",
+                {"sales_invoice": child_invoice.name, "remarks": get_split_remarks(child_invoice)},
+            ).db_insert()
+
+    if len(referenced) < len(parent.custom_split_children):
+        parent._add_split_comments()
+    parent.db_set("custom_pending_split", None, update_modified=False)
+
+    alert = get_split_alert(child_invoices, split_groups)
+    frappe.publish_realtime(
+        "msgprint",
+        {"message": alert["msg"], "title": alert["title"], "indicator": alert["indicator"]},
+        user=user,
+        after_commit=True,
     )
-
-    if cost_centers:
-        return cost_centers[0].name
-
-    # Last resort - return None and let ERPNext handle it
-    return None
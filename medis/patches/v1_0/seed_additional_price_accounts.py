@@ -0,0 +1,46 @@
+import frappe
+
+# Accounts that used to be hard-coded in CustomSalesInvoice.create_journal_entry
+POSTING_COMPANY = "MedisPrime"
+ACCOUNTS = {
+	"LBP": (
+		"411000001 - CLIENTS LBP - P",
+		"70100001 - SALES LBP - P",
+		"67510001 - NORMAL OPERATIONS LBP - P",
+	),
+	"USD": (
+		"411000002 - CLIENTS USD - P",
+		"70100002 - SALES USD - P",
+		"67510002 - NORMAL OPERATIONS USD - P",
+	),
+	"EUR": (
+		"411000003 - CLIENTS EUR - P",
+		"70100003 - SALES EUR - P",
+		"67510003 - NORMAL OPERATIONS EUR - P",
+	),
+}
+
+
+def execute():
+	if not frappe.db.exists("Company", POSTING_COMPANY):
+		return
+
+	settings = frappe.get_single("Medis Settings")
+	if settings.additional_price_accounts:
+		return
+
+	settings.additional_price_company = POSTING_COMPANY
+	for currency, (receivable, sales, expense) in ACCOUNTS.items():
+		if not all(frappe.db.exists("Account", account) for account in (receivable, sales, expense)):
+			continue
+		settings.append(
+			"additional_price_accounts",
+			{
+				"company": POSTING_COMPANY,
+				"currency": currency,
+				"receivable_account": receivable,
+				"sales_account": sales,
+				"expense_account": expense,
+			},
+		)
+	settings.save()
@@ -33,13 +33,10 @@ frappe.ui.form.on("Sales Invoice", {
 		if (frm.doc.workflow_state == "Ready For Picking") {
 			let printService = new frappe.silent_print.WebSocketPrinter();
 			frappe.call({
-				method: "silent_print.utils.print_format.create_pdf",
+				// served from the PDF pre-rendered when the invoice became Ready For Picking
+				method: "medis.utils.print_cache.get_invoice_pdf",
 				args: {
-					doctype: "Sales Invoice",
-					name: frm.doc.name,
-					silent_print_format: "Medis Split Invoice",
-					no_letterhead: 0,
-					_lang: "en",
+					invoice: frm.doc.name,
 				},
 				callback: (r) => {
 					printService.submit({
@@ -54,15 +51,31 @@ frappe.ui.form.on("Sales Invoice", {
 
 	refresh: function (frm) {
 		// Auto-check is_free for items with 100% discount or zero amount
-		frm.doc.items.forEach(function (item, index) {
-			if (item.discount_percentage == 100 || item.amount == 0) {
-				if (!item.is_free) {
-					frappe.model.set_value(item.doctype, item.name, "is_free", 1);
+		if (frm.doc.docstatus === 0) {
+			(frm.doc.items || []).forEach(function (item) {
+				if ((item.discount_percentage == 100 || item.amount == 0) && !item.is_free) {
+					queue_free_item(frm, item.name);
 				}
-			}
-		});
+			});
+		}
+		// the background split failed: its moved lines are still waiting for their invoices
+		if (frm.doc.docstatus === 1 && frm.doc.custom_pending_split) {
+			frm.add_custom_button(__("Retry Split"), () => {
+				frappe.call({
+					method: "medis.overrides.sales_invoice.retry_invoice_split",
+					args: { invoice: frm.doc.name },
+					callback: () => frappe.show_alert({ message: __("Split queued"), indicator: "blue" }),
+				});
+			});
+		}
 		update_currency_labels(frm);
 	},
+
+	validate(frm) {
+		// Apply row changes still waiting for the next frame before saving
+		flush_item_updates(frm);
+	},
+
 	naming_series(frm) {
 		if (!frm.doc.naming_series) return;
 
@@ -89,21 +102,10 @@ frappe.ui.form.on("Sales Invoice Item", {
 
 		if (item.is_free) {
 			// When is_free is checked, set discount to 100% and bypass pricing rules
-			frappe.model.set_value(cdt, cdn, "discount_percentage", 100);
-			frappe.model.set_value(cdt, cdn, "margin_rate_or_amount", 0);
-
-			// Clear pricing rule reference to bypass it
-			if (item.pricing_rules) {
-				frappe.model.set_value(cdt, cdn, "pricing_rules", "[]");
-			}
-
-			// Recalculate amounts
-			frm.script_manager.trigger("discount_percentage", cdt, cdn);
+			queue_free_item(frm, cdn);
 		} else {
 			// When is_free is unchecked, reset discount and re-apply pricing rules
-			frappe.model.set_value(cdt, cdn, "discount_percentage", 0);
-
-			// Trigger pricing rule re-application
+			queue_item_update(frm, cdn, { discount_percentage: 0 });
 			frm.script_manager.trigger("item_code", cdt, cdn);
 		}
 	},
@@ -113,10 +115,10 @@ frappe.ui.form.on("Sales Invoice Item", {
 
 		// Auto-check is_free when discount is 100%
 		if (item.discount_percentage == 100 && !item.is_free) {
-			frappe.model.set_value(cdt, cdn, "is_free", 1);
-		} else if (item.discount_percentage != 100 && item.is_free && !frm._setting_is_free) {
-			// Uncheck is_free if discount is changed from 100% (but not when we're setting it programmatically)
-			frappe.model.set_value(cdt, cdn, "is_free", 0);
+			queue_free_item(frm, cdn);
+		} else if (item.discount_percentage != 100 && item.is_free && !is_queued_free(frm, cdn)) {
+			// Uncheck is_free if discount is changed from 100% (but not while a free update is pending)
+			queue_item_update(frm, cdn, { is_free: 0 });
 		}
 	},
 
@@ -125,69 +127,121 @@ frappe.ui.form.on("Sales Invoice Item", {
 
 		// Auto-check is_free when amount is 0
 		if (item.amount == 0 && !item.is_free) {
-			frappe.model.set_value(cdt, cdn, "is_free", 1);
-		} else if (item.amount != 0 && item.is_free && !frm._setting_is_free) {
-			// Uncheck is_free if amount is changed from 0 (but not when we're setting it programmatically)
-			frappe.model.set_value(cdt, cdn, "is_free", 0);
+			queue_free_item(frm, cdn);
+		} else if (item.amount != 0 && item.is_free && !is_queued_free(frm, cdn)) {
+			// Uncheck is_free if amount is changed from 0 (but not while a free update is pending)
+			queue_item_update(frm, cdn, { is_free: 0 });
 		}
 	},
 
 	rate: function (frm, cdt, cdn) {
-		let item = locals[cdt][cdn];
-
 		// When rate changes and item is marked as free, maintain 100% discount
-		if (item.is_free) {
-			frm._setting_is_free = true;
-			frappe.model.set_value(cdt, cdn, "discount_percentage", 100);
-			setTimeout(() => {
-				frm._setting_is_free = false;
-			}, 100);
+		if (locals[cdt][cdn].is_free) {
+			queue_free_item(frm, cdn);
 		}
 	},
 
 	qty: function (frm, cdt, cdn) {
-		let item = locals[cdt][cdn];
-
 		// When quantity changes and item is marked as free, maintain 100% discount
-		if (item.is_free) {
-			frm._setting_is_free = true;
-			frappe.model.set_value(cdt, cdn, "discount_percentage", 100);
-			setTimeout(() => {
-				frm._setting_is_free = false;
-			}, 100);
+		// once any quantity-based pricing rule has been fetched
+		if (locals[cdt][cdn].is_free) {
+			frappe.after_ajax(() => queue_free_item(frm, cdn));
 		}
 	},
 
 	item_code: function (frm, cdt, cdn) {
-		let item = locals[cdt][cdn];
-
-		// If item is marked as free, prevent pricing rule application and set discount to 100%
-		if (item.is_free) {
-			setTimeout(() => {
-				frm._setting_is_free = true;
-				frappe.model.set_value(cdt, cdn, "discount_percentage", 100);
-				if (item.pricing_rules) {
-					frappe.model.set_value(cdt, cdn, "pricing_rules", "[]");
-				}
-				setTimeout(() => {
-					frm._setting_is_free = false;
-				}, 100);
-			}, 500); // Delay to allow pricing rules to be applied first, then override
+		// If item is marked as free, override the pricing rules once they have been applied
+		if (locals[cdt][cdn].is_free) {
+			frappe.after_ajax(() => queue_free_item(frm, cdn));
 		}
 	},
 	custom_additional_price: function (frm) {
-		let total = 0;
-		(frm.doc.items || []).forEach((row) => (total += row.custom_additional_price || 0));
-		frm.set_value("custom_total_additional_price", total);
+		queue_item_update(frm);
 	},
 	items_remove: function (frm) {
-		let total = 0;
-		(frm.doc.items || []).forEach((row) => (total += row.custom_additional_price || 0));
-		frm.set_value("custom_total_additional_price", total);
-		frm.refresh_fields();
+		queue_item_update(frm);
 	},
 });
 
+// Item row changes are queued and applied together on the next animation frame:
+// the values are written to the rows without firing field triggers, then the
+// totals are recalculated and the form refreshed once for the whole batch.
+const FREE_ITEM_VALUES = {
+	is_free: 1,
+	discount_percentage: 100,
+	margin_rate_or_amount: 0,
+	pricing_rules: "[]",
+};
+
+function queue_free_item(frm, cdn) {
+	queue_item_update(frm, cdn, FREE_ITEM_VALUES);
+}
+
+function is_queued_free(frm, cdn) {
+	let values = frm._item_updates && frm._item_updates.rows[cdn];
+	return !!(values && values.is_free);
+}
+
+function queue_item_update(frm, cdn, values) {
+	if (!frm._item_updates) {
+		frm._item_updates = {
+			docname: frm.doc.name,
+			rows: {},
+			frame: requestAnimationFrame(() => flush_item_updates(frm)),
+		};
+	}
+	if (cdn) {
+		frm._item_updates.rows[cdn] = Object.assign(frm._item_updates.rows[cdn] || {}, values);
+	}
+}
+
+function flush_item_updates(frm) {
+	let updates = frm._item_updates;
+	if (!updates) return;
+
+	cancelAnimationFrame(updates.frame);
+	frm._item_updates = null;
+	if (updates.docname !== frm.doc.name) return;
+
+	let rows_changed = false;
+	Object.entries(updates.rows).forEach(([cdn, values]) => {
+		let item = locals["Sales Invoice Item"][cdn];
+		if (!item) return;
+
+		Object.assign(item, values);
+		if ("discount_percentage" in values) {
+			apply_item_discount(item);
+		}
+		rows_changed = true;
+	});
+
+	frm.doc.custom_total_additional_price = (frm.doc.items || []).reduce(
+		(total, row) => total + (row.custom_additional_price || 0),
+		0
+	);
+	frm.dirty();
+
+	if (rows_changed) {
+		// recalculates every total and refreshes the form
+		frm.cscript.calculate_taxes_and_totals();
+	} else {
+		frm.refresh_field("custom_total_additional_price");
+	}
+}
+
+function apply_item_discount(item) {
+	if (item.is_free) {
+		item.rate = 0;
+		item.discount_amount = flt(item.price_list_rate);
+	} else if (item.price_list_rate) {
+		item.rate = flt(
+			item.price_list_rate * (1 - item.discount_percentage / 100),
+			precision("rate", item)
+		);
+		item.discount_amount = flt(item.price_list_rate - item.rate, precision("discount_amount", item));
+	}
+}
+
 function update_currency_labels(frm) {
 	// Get the current currency from the document
 	let current_currency =
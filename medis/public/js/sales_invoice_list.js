@@ -3,6 +3,7 @@ frappe.listview_settings["Sales Invoice"] = {
 
 	onload(listview) {
 		this.setup_action_column(listview);
+		this.add_bulk_print_action(listview);
 	},
 
 	refresh(listview) {
@@ -22,6 +23,124 @@ frappe.listview_settings["Sales Invoice"] = {
 		}, 0);
 	},
 
+	add_bulk_print_action(listview) {
+		listview.page.add_actions_menu_item(__("Print"), () => {
+			const names = listview
+				.get_checked_items()
+				.filter((d) => d.workflow_state === "Pending" && !d.name.startsWith("ACC-VSINV-"))
+				.map((d) => d.name);
+
+			if (!names.length) {
+				frappe.msgprint(__("Select at least one Pending invoice to print."));
+				return;
+			}
+
+			// listening before the call, so a batch built before it returns is not missed
+			const batch_id = frappe.utils.get_random(12);
+			const stop_waiting = this.print_batch_when_ready(batch_id);
+
+			frappe.call({
+				method: "medis.api.print_utils.print_invoices",
+				args: { invoices: names, batch_id },
+				freeze: true,
+				freeze_message: __("Releasing {0} invoices...", [names.length]),
+				error: () => stop_waiting(),
+				callback: (r) => {
+					const failed = r.message.results.filter((result) => !result.ok);
+					if (!r.message.batch_id) stop_waiting();
+					if (failed.length) {
+						frappe.msgprint({
+							title: __("Some invoices were not printed"),
+							message: failed.map((result) => result.msg).join("<br>"),
+							indicator: "orange",
+						});
+					} else {
+						frappe.show_alert({
+							message: __("{0} invoices released, the PDF is being prepared", [names.length]),
+							indicator: "blue",
+						});
+					}
+					listview.clear_checked_items();
+					listview.refresh();
+				},
+			});
+		}, false);
+	},
+
+	print_batch_when_ready(batch_id) {
+		// the merged PDF is built in the background, see print_utils.build_print_batch;
+		// announced over realtime, and polled for in case the event is missed
+		const poll_interval = 5000;
+		const timeout = 10 * 60 * 1000;
+		const started = Date.now();
+		// connects while the batch is built
+		const printService = new frappe.silent_print.WebSocketPrinter();
+		let done = false;
+		let timer = null;
+
+		const stop = () => {
+			done = true;
+			clearTimeout(timer);
+			frappe.realtime.off("medis_print_batch_ready", on_ready);
+		};
+		const fetch_batch = () => {
+			clearTimeout(timer);
+			frappe.call({
+				method: "medis.api.print_utils.get_print_batch",
+				args: { batch_id },
+				error: () => {
+					if (!done) timer = setTimeout(fetch_batch, poll_interval);
+				},
+				callback: (r) => {
+					if (done) return;
+					if (r.message.ready) {
+						stop();
+						this.print_batch(printService, r.message);
+					} else if (Date.now() - started > timeout) {
+						stop();
+						frappe.msgprint({
+							title: __("Print not sent"),
+							message: __(
+								"The PDF of the printed invoices was not ready in time. They are Ready For Picking and can be printed from their form."
+							),
+							indicator: "orange",
+						});
+					} else {
+						timer = setTimeout(fetch_batch, poll_interval);
+					}
+				},
+			});
+		};
+		const on_ready = (data) => {
+			if (data.batch_id === batch_id && !done) fetch_batch();
+		};
+
+		frappe.realtime.on("medis_print_batch_ready", on_ready);
+		timer = setTimeout(fetch_batch, poll_interval);
+		return stop;
+	},
+
+	print_batch(printService, batch) {
+		if (batch.failed.length) {
+			frappe.msgprint({
+				title: __("Some invoices could not be rendered"),
+				message: batch.failed.map((result) => `${result.invoice}: ${result.msg}`).join("<br>"),
+				indicator: "orange",
+			});
+		}
+		if (!batch.count) return;
+
+		printService.submit({
+			type: "Invoice Printer",
+			url: "file.pdf",
+			file_content: batch.pdf_base64,
+		});
+		frappe.show_alert({
+			message: __("{0} invoices sent to the printer", [batch.count]),
+			indicator: "green",
+		});
+	},
+
 	add_print_buttons(listview) {
 		listview.$result.find(".list-row:not(.list-row-head)").each(function (index) {
 			const $row = $(this);
@@ -79,26 +198,23 @@ frappe.listview_settings["Sales Invoice"] = {
                         freeze_message: __('Processing...'),
                         callback(r) {
                             listview.refresh();
+
+                            // fetched after the transition so the cached render matches the printed invoice
+                            frappe.call({
+                                method: "medis.utils.print_cache.get_invoice_pdf",
+                                args: {
+                                    invoice: name,
+                                },
+                                callback: (r) => {
+                                    printService.submit({
+                                        type: 'Invoice Printer',
+                                        url: "file.pdf",
+                                        file_content: r.message.pdf_base64,
+                                    });
+                                },
+                            });
                         }
                     });
-
-					frappe.call({
-						method: "silent_print.utils.print_format.create_pdf",
-						args: {
-							doctype: 'Sales Invoice',
-							name: name,
-							silent_print_format: 'Medis Split Invoice',
-							no_letterhead: 0,
-							_lang: "en",
-						},
-						callback: (r) => {
-							printService.submit({
-								type: 'Invoice Printer',
-								url: "file.pdf",
-								file_content: r.message.pdf_base64,
-							});
-						},
-					});
 				}
 			});
 		});
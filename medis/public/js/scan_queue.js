@@ -0,0 +1,277 @@
+// Offline-tolerant queue for the scanning screens.
+//
+// Every scan is stored in IndexedDB with a per-station sequence number before
+// it is sent, then replayed in order through medis.api.scan_utils.process_scans,
+// one batch at a time. The server applies each seq once, so a batch resent
+// after a lost response or a network blip does not double-apply its scans.
+
+frappe.provide("medis");
+
+medis.ScanQueue = class ScanQueue {
+	static DB_NAME = "medis_scan_queue";
+	static STORE = "scans";
+	static RETRY_DELAYS = [1000, 2000, 5000, 10000, 30000];
+	// no response, or a proxy that gave up waiting: the batch may not have been
+	// applied yet and is resent; any other error is the server's final answer
+	static RETRY_STATUSES = [0, 408, 502, 503, 504];
+
+	constructor({ name, on_result, on_session, on_pending, batch_size = 50 }) {
+		// one station per tab, kept across reloads of the tab with its seq: two
+		// tabs sharing a station would number their scans the same
+		this.name = name;
+		this.storage_key = `medis_scan_station:${name}`;
+		// the station used to be shared through localStorage: the first tab takes it over
+		const saved = JSON.parse(
+			sessionStorage.getItem(this.storage_key) || localStorage.getItem(this.storage_key) || "null"
+		);
+		localStorage.removeItem(this.storage_key);
+		this.station = saved ? saved.station : frappe.utils.get_random(10);
+		this.seq = saved ? saved.seq : 0;
+		this.save_station();
+
+		this.on_result = on_result || (() => {});
+		this.on_session = on_session || (() => {});
+		this.on_pending = on_pending || (() => {});
+		this.batch_size = batch_size;
+		this.in_flight = false;
+		this.retries = 0;
+		// after a batch failed on the server, its scans are sent one by one so
+		// only the failing one is dropped
+		this.isolate = false;
+		// the tab's own station first, then the ones adopted from closed tabs
+		this.stations = [this.station];
+		this.release_station = {};
+		// used when IndexedDB is not available, e.g. private browsing
+		this.memory = [];
+		this.db = this.open_db();
+
+		// scans wait until the tab knows its station is its own
+		this.ready = this.hold_station();
+		window.addEventListener("online", () => this.flush());
+		// replay what a previous load of the tab left behind
+		this.flush();
+	}
+
+	push(scan) {
+		return this.ready.then(() => {
+			scan = { ...scan, queue: this.name, station: this.station, seq: ++this.seq };
+			this.save_station();
+			return this.store(scan).then(() => {
+				this.flush();
+				return scan.seq;
+			});
+		});
+	}
+
+	save_station() {
+		sessionStorage.setItem(this.storage_key, JSON.stringify({ station: this.station, seq: this.seq }));
+	}
+
+	hold_station() {
+		// the station is locked while its tab is open, so another tab can tell the
+		// scans a closed tab left queued and send them in its place
+		if (!navigator.locks) return Promise.resolve();
+		return new Promise((resolve) => {
+			navigator.locks.request(this.lock_name(this.station), { ifAvailable: true }, (lock) => {
+				if (!lock) {
+					// "Duplicate tab" copies sessionStorage: the station is the other tab's
+					this.station = frappe.utils.get_random(10);
+					this.seq = 0;
+					this.stations = [this.station];
+					this.save_station();
+					resolve(this.hold_station());
+					return;
+				}
+				this.db.then((db) => db && this.adopt_stations());
+				resolve();
+				return new Promise(() => {});
+			});
+		});
+	}
+
+	adopt_stations() {
+		return this.transaction("readonly", (store) => store.getAll()).then((scans) => {
+			const stations = new Set(
+				scans
+					.filter((scan) => scan.queue === this.name && scan.station !== this.station)
+					.map((scan) => scan.station)
+			);
+			stations.forEach((station) =>
+				navigator.locks.request(this.lock_name(station), { ifAvailable: true }, (lock) => {
+					if (!lock) return;
+					this.stations.push(station);
+					this.flush();
+					// held until the station's queue is empty
+					return new Promise((resolve) => (this.release_station[station] = resolve));
+				})
+			);
+		});
+	}
+
+	lock_name(station) {
+		return `medis_scan_station:${this.name}:${station}`;
+	}
+
+	flush() {
+		if (this.in_flight) return;
+		this.in_flight = true;
+
+		this.ready
+			.then(() => this.next_batch())
+			.then((batch) => {
+				if (!batch) {
+					this.in_flight = false;
+					return;
+				}
+				return this.send(batch.station, batch.scans);
+			})
+			.catch(() => {
+				this.in_flight = false;
+			});
+	}
+
+	next_batch(i = 0) {
+		// the tab's own queue first, then the adopted ones
+		const station = this.stations[i];
+		if (!station) return Promise.resolve(null);
+		return this.load(station, this.isolate ? 1 : this.batch_size).then((scans) => {
+			if (scans.length) return { station, scans };
+			if (station === this.station) return this.next_batch(i + 1);
+			// everything the closed tab left has been sent
+			this.release(station);
+			return this.next_batch(i);
+		});
+	}
+
+	release(station) {
+		this.stations = this.stations.filter((s) => s !== station);
+		this.release_station[station]();
+		delete this.release_station[station];
+	}
+
+	send(station, scans) {
+		return new Promise((resolve) => {
+			const done = (seqs) =>
+				this.remove(station, seqs).then(() => {
+					this.in_flight = false;
+					this.flush();
+					resolve();
+				});
+			const retry = () => {
+				// keep the scans queued and try again, backing off while the server is unreachable
+				const delay = ScanQueue.RETRY_DELAYS[Math.min(this.retries++, ScanQueue.RETRY_DELAYS.length - 1)];
+				this.in_flight = false;
+				this.on_pending(scans.length);
+				setTimeout(() => this.flush(), delay);
+				resolve();
+			};
+
+			frappe
+				.call({
+					method: "medis.api.scan_utils.process_scans",
+					args: {
+						station,
+						scans: scans.map(({ seq, kind, barcode, invoice }) => ({ seq, kind, barcode, invoice })),
+					},
+					type: "POST",
+					freeze: false,
+					callback: (r) => {
+						// another request of the station is still being applied
+						if (r.message.busy) return retry();
+						this.retries = 0;
+						this.isolate = false;
+						(r.message.sessions || []).forEach((session) => this.on_session(session));
+						scans.forEach((scan) => this.on_result(scan, r.message.results[scan.seq]));
+						done(scans.map((scan) => scan.seq));
+					},
+				})
+				.fail((xhr) => {
+					if (ScanQueue.RETRY_STATUSES.includes(xhr.status)) return retry();
+					this.retries = 0;
+					if (scans.length > 1) {
+						// resend the batch scan by scan to find the one the server rejects
+						this.isolate = true;
+						this.in_flight = false;
+						this.flush();
+						return resolve();
+					}
+					// the server will keep rejecting it: report it and move on
+					const msg = __("Scan {0} could not be processed ({1})", [scans[0].barcode, xhr.status]);
+					this.on_result(scans[0], { ok: false, msg });
+					done([scans[0].seq]);
+				});
+		});
+	}
+
+	open_db() {
+		if (!window.indexedDB) return Promise.resolve(null);
+		return new Promise((resolve) => {
+			const request = indexedDB.open(ScanQueue.DB_NAME, 1);
+			request.onupgradeneeded = () => {
+				request.result.createObjectStore(ScanQueue.STORE, { keyPath: ["station", "seq"] });
+			};
+			request.onsuccess = () => resolve(request.result);
+			request.onerror = () => resolve(null);
+		});
+	}
+
+	transaction(mode, fn) {
+		return this.db.then((db) => {
+			if (!db) return fn(null);
+			return new Promise((resolve, reject) => {
+				const tx = db.transaction(ScanQueue.STORE, mode);
+				const result = fn(tx.objectStore(ScanQueue.STORE));
+				tx.oncomplete = () => resolve(result && "result" in result ? result.result : result);
+				tx.onerror = () => reject(tx.error);
+			});
+		});
+	}
+
+	store(scan) {
+		return this.transaction("readwrite", (store) => (store ? store.put(scan) : this.memory.push(scan)));
+	}
+
+	load(station, limit) {
+		return this.transaction("readonly", (store) => {
+			if (!store) return this.memory.slice(0, limit);
+			// keys sort by [station, seq], so this is the station's queue in order
+			const range = IDBKeyRange.bound([station, 0], [station, Infinity]);
+			return store.getAll(range, limit);
+		});
+	}
+
+	remove(station, seqs) {
+		return this.transaction("readwrite", (store) => {
+			if (!store) {
+				this.memory = this.memory.filter((scan) => !seqs.includes(scan.seq));
+				return;
+			}
+			seqs.forEach((seq) => store.delete([station, seq]));
+		});
+	}
+};
+
+// Invoice state changes are published to the invoice's document room: a
+// station joins the room of each invoice it moved. frappe.realtime.doc_subscribe
+// drops calls made within a second of the last one, too slow for a scanner.
+medis.WATCHED_INVOICES = 500;
+medis.watched_invoices = new Set();
+
+medis.watch_invoice = function (invoice) {
+	const socket = frappe.realtime.socket;
+	const watched = medis.watched_invoices;
+	if (!socket || watched.has(invoice)) return;
+	if (!watched.size) {
+		// rooms are lost with the connection
+		socket.on("connect", () =>
+			watched.forEach((name) => socket.emit("doc_subscribe", "Sales Invoice", name))
+		);
+	}
+	watched.add(invoice);
+	socket.emit("doc_subscribe", "Sales Invoice", invoice);
+	if (watched.size > medis.WATCHED_INVOICES) {
+		const oldest = watched.values().next().value;
+		watched.delete(oldest);
+		socket.emit("doc_unsubscribe", "Sales Invoice", oldest);
+	}
+};
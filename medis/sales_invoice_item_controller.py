@@ -1,12 +1,55 @@
 import frappe
 from frappe import _
 
+# Row fields the is_free logic reads or writes. Rows where none of them changed
+# since the last save were already processed then and are skipped.
+IS_FREE_FIELDS = (
+    "item_code",
+    "qty",
+    "rate",
+    "price_list_rate",
+    "amount",
+    "discount_percentage",
+    "margin_rate_or_amount",
+    "pricing_rules",
+    "is_free",
+)
+
 def validate_sales_invoice_item(doc, method):
     """
-    Server-side validation and processing for Sales Invoice Items with is_free functionality
+    Server-side validation and processing for Sales Invoice Items with is_free functionality.
+    Only new or changed rows are processed; pricing rules cleared on free items
+    are reported in a single alert.
     """
-    for item in doc.items:
+    cleared_items = []
+    for item in get_changed_items(doc):
+        had_pricing_rules = item.pricing_rules and item.pricing_rules != "[]"
         handle_is_free_logic(item, doc)
+        if had_pricing_rules and item.pricing_rules == "[]":
+            cleared_items.append(item.item_code)
+
+    if cleared_items:
+        frappe.msgprint(
+            _("Pricing rules have been cleared for free items: {0}").format(", ".join(cleared_items)),
+            alert=True
+        )
+
+def get_changed_items(doc):
+    """
+    Return the rows of `doc.items` that are new or differ from the saved invoice
+    in any of IS_FREE_FIELDS. All rows for an invoice that is not saved yet.
+    """
+    doc_before_save = doc.get_doc_before_save()
+    if not doc_before_save:
+        return doc.items
+
+    saved_rows = {row.name: row for row in doc_before_save.items}
+    changed_items = []
+    for item in doc.items:
+        saved_row = saved_rows.get(item.name)
+        if not saved_row or any(item.get(field) != saved_row.get(field) for field in IS_FREE_FIELDS):
+            changed_items.append(item)
+    return changed_items
 
 def handle_is_free_logic(item, parent_doc):
     """
@@ -39,12 +82,6 @@ def handle_is_free_logic(item, parent_doc):
         # Reset discount only if it was 100% (indicating it was set by is_free)
         item.discount_percentage = 0
 
-def before_save_sales_invoice_item(doc, method):
-    """
-    Process is_free logic before saving the Sales Invoice
-    """
-    validate_sales_invoice_item(doc, method)
-
 def on_update_sales_invoice_item(doc, method):
     """
     Process is_free logic after updating the Sales Invoice
@@ -52,29 +89,10 @@ def on_update_sales_invoice_item(doc, method):
     # Additional processing if needed after save
     pass
 
-def validate_pricing_rule_bypass(doc, method):
-    """
-    Validate that pricing rules are properly bypassed for free items
-    """
-    for item in doc.items:
-        if getattr(item, 'is_free', 0):
-            # Ensure no pricing rules are applied to free items
-            if item.pricing_rules and item.pricing_rules != "[]":
-                frappe.msgprint(
-                    _("Pricing rules have been cleared for free item: {0}").format(item.item_code),
-                    alert=True
-                )
-                item.pricing_rules = "[]"
-
 # -------------------- Hook Functions --------------------
 def sales_invoice_validate(doc, method):
     """Main validation function to be called from hooks.py"""
     validate_sales_invoice_item(doc, method)
-    validate_pricing_rule_bypass(doc, method)
-
-def sales_invoice_before_save(doc, method):
-    """Before save function to be called from hooks.py"""
-    before_save_sales_invoice_item(doc, method)
 
 def sales_invoice_on_update(doc, method):
     """On update function to be called from hooks.py"""
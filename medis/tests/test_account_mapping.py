@@ -0,0 +1,48 @@
+# Copyright (c) 2025, Marwa and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from medis.utils.account_mapping import get_additional_price_accounts
+
+
+class TestAccountMapping(FrappeTestCase):
+	def setUp(self):
+		settings = frappe.get_single("Medis Settings")
+		settings.additional_price_company = None
+		settings.set(
+			"additional_price_accounts",
+			[
+				{
+					"company": "_Test Company",
+					"currency": "INR",
+					"receivable_account": "Debtors - _TC",
+					"sales_account": "Sales - _TC",
+					"expense_account": "Cost of Goods Sold - _TC",
+				}
+			],
+		)
+		settings.save()
+
+	def test_resolution_is_cached(self):
+		accounts = get_additional_price_accounts("_Test Company", "INR")
+		self.assertEqual(accounts.company, "_Test Company")
+		self.assertEqual(accounts.receivable, "Debtors - _TC")
+
+		with self.assertQueryCount(0):
+			get_additional_price_accounts("_Test Company", "INR")
+
+	def test_settings_change_invalidates_cache(self):
+		get_additional_price_accounts("_Test Company", "INR")
+
+		settings = frappe.get_single("Medis Settings")
+		settings.additional_price_accounts[0].cost_center = "_Test Cost Center - _TC"
+		settings.save()
+
+		self.assertEqual(
+			get_additional_price_accounts("_Test Company", "INR").cost_center, "_Test Cost Center - _TC"
+		)
+
+	def test_missing_mapping_throws(self):
+		self.assertRaises(frappe.ValidationError, get_additional_price_accounts, "_Test Company", "EUR")
@@ -0,0 +1,43 @@
+# Copyright (c) 2025, Marwa and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from medis.utils.barcode_index import build_barcode_index, get_barcode_index, get_item_by_barcode
+
+
+class TestBarcodeIndex(FrappeTestCase):
+	def setUp(self):
+		if frappe.db.exists("Item", "_Test Medis Barcode Item"):
+			self.item = frappe.get_doc("Item", "_Test Medis Barcode Item")
+		else:
+			self.item = frappe.new_doc("Item")
+			self.item.update(
+				{
+					"item_code": "_Test Medis Barcode Item",
+					"item_group": "_Test Item Group",
+					"stock_uom": "Nos",
+				}
+			)
+
+		self.item.item_name = "_Test Medis Barcode Item"
+		self.item.set("barcodes", [{"barcode": "4006381333931"}])
+		self.item.save()
+		build_barcode_index()
+
+	def test_lookup_does_not_query_the_database(self):
+		with self.assertQueryCount(0):
+			self.assertEqual(get_item_by_barcode(" 4006381333931 "), [self.item.name, self.item.item_name])
+			self.assertIsNone(get_item_by_barcode("0000000000000"))
+
+	def test_item_changes_update_the_index(self):
+		self.item.barcodes[0].barcode = "4006381333948"
+		self.item.item_name = "_Test Medis Barcode Item Renamed"
+		self.item.save()
+		# the index is updated once the save commits
+		frappe.db.after_commit.run()
+
+		self.assertIsNone(get_item_by_barcode("4006381333931"))
+		self.assertEqual(get_item_by_barcode("4006381333948"), [self.item.name, self.item.item_name])
+		self.assertIn("4006381333948", get_barcode_index())
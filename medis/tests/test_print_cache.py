@@ -0,0 +1,38 @@
+# Copyright (c) 2025, Marwa and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from medis.utils.print_cache import get_print_version
+
+
+class TestPrintCache(FrappeTestCase):
+	def make_invoice(self):
+		invoice = frappe.new_doc("Sales Invoice")
+		invoice.customer = "_Test Customer"
+		invoice.workflow_state = "Ready For Picking"
+		invoice.append("items", {"item_code": "_Test Item", "qty": 2, "rate": 10})
+		return invoice
+
+	def test_workflow_changes_keep_the_print_version(self):
+		invoice = self.make_invoice()
+		version = get_print_version(invoice)
+
+		invoice.update(
+			{
+				"workflow_state": "Controlling",
+				"custom_picker": "Administrator",
+				"modified": frappe.utils.now(),
+			}
+		)
+
+		self.assertEqual(get_print_version(invoice), version)
+
+	def test_printed_changes_make_a_new_print_version(self):
+		invoice = self.make_invoice()
+		version = get_print_version(invoice)
+
+		invoice.items[0].qty = 3
+
+		self.assertNotEqual(get_print_version(invoice), version)
@@ -0,0 +1,39 @@
+# Copyright (c) 2025, Marwa and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from medis.utils.print_context import get_split_invoice_context
+
+
+class TestPrintContext(FrappeTestCase):
+	def make_invoice(self, lines):
+		invoice = frappe.new_doc("Sales Invoice")
+		invoice.name = "SI-TEST-PRINT-CONTEXT"
+		invoice.customer = "_Test Customer"
+		invoice.customer_address = "_Test Address-Billing"
+		for i in range(lines):
+			invoice.append(
+				"items",
+				{
+					"item_code": f"_Test Item {i}",
+					"batch_no": f"_Test Batch {i}",
+					"item_tax_template": "_Test Item Tax Template",
+				},
+			)
+		return invoice
+
+	def test_query_count_does_not_grow_with_lines(self):
+		small, large = self.make_invoice(10), self.make_invoice(200)
+		# warm the barcode cache so only master-data lookups are counted
+		get_split_invoice_context(small)
+		get_split_invoice_context(large)
+
+		with self.assertQueryCount(3):
+			get_split_invoice_context(small)
+
+		with self.assertQueryCount(3):
+			context = get_split_invoice_context(large)
+
+		self.assertIsInstance(context.batch_expiry, dict)
@@ -0,0 +1,45 @@
+# Copyright (c) 2025, Marwa and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from medis.sales_invoice_item_controller import get_changed_items, validate_sales_invoice_item
+
+
+class TestSalesInvoiceItemController(FrappeTestCase):
+	def make_invoice(self, lines):
+		invoice = frappe.get_doc({"doctype": "Sales Invoice", "customer": "_Test Customer"})
+		for i in range(lines):
+			invoice.append(
+				"items",
+				{"name": f"row-{i}", "item_code": "_Test Item", "qty": 1, "rate": 10, "amount": 10},
+			)
+		return invoice
+
+	def test_only_changed_rows_are_processed(self):
+		invoice = self.make_invoice(100)
+		invoice._doc_before_save = frappe.get_doc(invoice.as_dict())
+
+		self.assertEqual(get_changed_items(invoice), [])
+
+		invoice.items[5].is_free = 1
+		invoice.append("items", {"item_code": "_Test Item", "qty": 1, "rate": 10, "amount": 10})
+		self.assertEqual(get_changed_items(invoice), [invoice.items[5], invoice.items[100]])
+
+	def test_unsaved_invoice_processes_every_row(self):
+		invoice = self.make_invoice(3)
+		self.assertEqual(len(get_changed_items(invoice)), 3)
+
+	def test_cleared_pricing_rules_are_reported_once(self):
+		invoice = self.make_invoice(3)
+		for row in invoice.items:
+			row.is_free = 1
+			row.pricing_rules = '["PRLE-0001"]'
+
+		frappe.clear_messages()
+		validate_sales_invoice_item(invoice, "validate")
+
+		self.assertEqual([row.discount_percentage for row in invoice.items], [100, 100, 100])
+		self.assertEqual([row.pricing_rules for row in invoice.items], ["[]", "[]", "[]"])
+		self.assertEqual(len(frappe.get_message_log()), 1)
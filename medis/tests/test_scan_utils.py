@@ -0,0 +1,72 @@
+# Copyright (c) 2025, Marwa and Contributors
+# See license.txt
+
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from medis.api import scan_utils
+
+
+class TestScanUtils(FrappeTestCase):
+	def setUp(self):
+		self.station = frappe.generate_hash(length=10)
+		self.pick = MagicMock(side_effect=lambda barcode: {"ok": True, "msg": f"Moved {barcode}"})
+		patcher = patch.dict(scan_utils.TRANSITION_SCANS, {"pick": self.pick})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def scan(self, seq, barcode):
+		return {"seq": seq, "kind": "pick", "barcode": barcode}
+
+	def control_scan(self, seq, barcode, invoice="INV-1"):
+		return {"seq": seq, "kind": "control", "barcode": barcode, "invoice": invoice}
+
+	def test_scans_are_applied_in_sequence_order(self):
+		response = scan_utils.process_scans(self.station, [self.scan(2, "B"), self.scan(1, "A")])
+
+		self.assertEqual([call.args[0] for call in self.pick.call_args_list], ["A", "B"])
+		self.assertEqual(response["last_seq"], 2)
+
+	def test_replayed_scans_are_applied_once(self):
+		first = scan_utils.process_scans(self.station, [self.scan(1, "A"), self.scan(2, "B")])
+		# the response was lost: the station resends the batch with a new scan
+		replay = scan_utils.process_scans(
+			self.station, [self.scan(1, "A"), self.scan(2, "B"), self.scan(3, "C")]
+		)
+
+		self.assertEqual(self.pick.call_count, 3)
+		self.assertEqual(replay["results"][1], first["results"][1])
+		self.assertEqual(replay["results"][3], {"ok": True, "msg": "Moved C"})
+
+	def test_another_scan_with_an_applied_seq_is_not_reported_as_applied(self):
+		scan_utils.process_scans(self.station, [self.scan(1, "A")])
+		# a second tab on the same station numbered its scan the same
+		response = scan_utils.process_scans(self.station, [self.scan(1, "B")])
+
+		self.assertEqual([call.args[0] for call in self.pick.call_args_list], ["A"])
+		self.assertFalse(response["results"][1]["ok"])
+
+	def test_consecutive_control_scans_are_recorded_as_one_batch(self):
+		session = {"success": True, "unknown": ["Y"], "rows": [], "summary": {}}
+		with patch.object(scan_utils.controller_utils, "record_scans", return_value=session) as record_scans:
+			response = scan_utils.process_scans(
+				self.station,
+				[
+					self.control_scan(1, "X"),
+					self.control_scan(2, "Y"),
+					self.scan(3, "A"),
+					self.control_scan(4, "Z"),
+				],
+			)
+
+		self.assertEqual(
+			[call.args[:2] for call in record_scans.call_args_list],
+			[("INV-1", ["X", "Y"]), ("INV-1", ["Z"])],
+		)
+		self.assertEqual(len(response["sessions"]), 2)
+		self.assertTrue(response["results"][1]["ok"])
+		self.assertFalse(response["results"][2]["ok"])
+		self.assertEqual(response["results"][3], {"ok": True, "msg": "Moved A"})
+		self.assertEqual(response["last_seq"], 4)
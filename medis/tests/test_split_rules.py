@@ -0,0 +1,75 @@
+# Copyright (c) 2025, Marwa and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from medis.utils import split_rules
+from medis.utils.split_rules import classify_invoice_items
+
+ITEM_ATTRIBUTES = {
+	"PARACETAMOL": {"custom_medication_type": "Medicine", "custom_storage_type": "Shelf"},
+	"INSULIN": {"custom_medication_type": "Medicine", "custom_storage_type": "Fridge"},
+	"BANDAGE": {"custom_medication_type": "Supply", "custom_storage_type": "Shelf"},
+}
+
+
+class TestSplitRules(FrappeTestCase):
+	def setUp(self):
+		patcher = patch.object(
+			split_rules,
+			"get_item_attributes",
+			side_effect=lambda item_codes: {code: ITEM_ATTRIBUTES[code] for code in item_codes},
+		)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def item(self, name, item_code, amount=10):
+		return frappe._dict(name=name, item_code=item_code, amount=amount, net_amount=amount)
+
+	def rule(self, rule_name, free_items_only=0, **conditions):
+		return frappe._dict(rule_name=rule_name, free_items_only=free_items_only, **conditions)
+
+	def test_a_line_goes_to_the_first_rule_it_matches(self):
+		items = [self.item("1", "INSULIN"), self.item("2", "PARACETAMOL")]
+		rules = [
+			self.rule("Fridge", storage_type="Fridge"),
+			self.rule("Medicine", medication_type="Medicine"),
+		]
+
+		groups, regular_items = classify_invoice_items(items, rules)
+
+		self.assertEqual(list(groups), ["Fridge", "Medicine"])
+		self.assertEqual(groups["Fridge"], [items[0]])
+		self.assertEqual(groups["Medicine"], [items[1]])
+		self.assertEqual(regular_items, [])
+
+	def test_free_items_only_rules_skip_paid_lines(self):
+		items = [self.item("1", "PARACETAMOL", amount=0), self.item("2", "PARACETAMOL")]
+		rules = [self.rule("Free Medicine", free_items_only=1, medication_type="Medicine")]
+
+		groups, regular_items = classify_invoice_items(items, rules)
+
+		self.assertEqual(groups, {"Free Medicine": [items[0]]})
+		self.assertEqual(regular_items, [items[1]])
+
+	def test_lines_matching_no_rule_stay_regular(self):
+		items = [self.item("1", "BANDAGE"), self.item("2", "PARACETAMOL")]
+		rules = [self.rule("Fridge", storage_type="Fridge")]
+
+		groups, regular_items = classify_invoice_items(items, rules)
+
+		self.assertEqual(groups, {})
+		self.assertEqual(regular_items, items)
+
+	def test_every_line_matching_one_rule_leaves_no_regular_lines(self):
+		items = [self.item("1", "INSULIN"), self.item("2", "PARACETAMOL")]
+		rules = [self.rule("Medicine", medication_type="Medicine")]
+
+		groups, regular_items = classify_invoice_items(items, rules)
+
+		# a single group and nothing regular: the invoice is not split
+		self.assertEqual(groups, {"Medicine": items})
+		self.assertEqual(regular_items, [])
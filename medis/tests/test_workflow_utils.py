@@ -0,0 +1,125 @@
+# Copyright (c) 2025, Marwa and Contributors
+# See license.txt
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from frappe.model.document import Document
+from frappe.tests.utils import FrappeTestCase
+
+from medis.api.picker_utils import transition_to_picking
+from medis.api.workflow_utils import DocumentClaimedError, apply_transition, claim_document
+
+
+class TestWorkflowUtils(FrappeTestCase):
+	def setUp(self):
+		self.invoice = create_sales_invoice(do_not_submit=True)
+		apply_transition(self.invoice, "Submit")
+		apply_transition(self.invoice, "Print")
+
+	def count_writes(self, db_update):
+		return sum(1 for call in db_update.call_args_list if call.args[0].name == self.invoice.name)
+
+	def test_transition_and_side_fields_are_one_write(self):
+		with patch.object(Document, "db_update", autospec=True, side_effect=Document.db_update) as db_update:
+			apply_transition(self.invoice, "Picking Scan", {"custom_picker": frappe.session.user})
+
+		self.assertEqual(self.count_writes(db_update), 1)
+		saved = frappe.db.get_value(
+			"Sales Invoice", self.invoice.name, ["workflow_state", "custom_picker"], as_dict=True
+		)
+		self.assertEqual(saved.workflow_state, "Picking")
+		self.assertEqual(saved.custom_picker, frappe.session.user)
+
+	def test_transition_condition_sees_the_side_fields(self):
+		apply_transition(self.invoice, "Picking Scan")
+		apply_transition(self.invoice, "Control Scan")
+
+		with patch.object(Document, "db_update", autospec=True, side_effect=Document.db_update) as db_update:
+			apply_transition(self.invoice, "Approve", {"custom_packs": 2})
+
+		self.assertEqual(self.count_writes(db_update), 1)
+		self.assertEqual(self.invoice.workflow_state, "Packed")
+
+	def test_invalid_action_throws(self):
+		self.assertRaises(frappe.ValidationError, apply_transition, self.invoice, "Archive")
+
+
+class TestConcurrentClaims(FrappeTestCase):
+	"""Runs workers on their own connections, so the invoice has to be committed."""
+
+	def setUp(self):
+		self.invoice = create_sales_invoice(do_not_submit=True)
+		apply_transition(self.invoice, "Submit")
+		apply_transition(self.invoice, "Print")
+		frappe.db.commit()
+		self.addCleanup(self.delete_invoice)
+
+	def delete_invoice(self):
+		frappe.db.rollback()
+		invoice = frappe.get_doc("Sales Invoice", self.invoice.name)
+		invoice.cancel()
+		frappe.delete_doc("Sales Invoice", invoice.name, force=True, ignore_permissions=True)
+		frappe.db.commit()
+
+	def run_in_worker(self, fn, *args):
+		site, sites_path, user = frappe.local.site, frappe.local.sites_path, frappe.session.user
+
+		def worker():
+			frappe.init(site=site, sites_path=sites_path)
+			frappe.connect()
+			frappe.set_user(user)
+			try:
+				result = fn(*args)
+				frappe.db.commit()
+				return result
+			finally:
+				frappe.destroy()
+
+		return worker
+
+	def test_locked_invoice_fails_fast_with_the_holder(self):
+		claim_document("Sales Invoice", self.invoice.name, ["workflow_state"])
+		try:
+			with ThreadPoolExecutor(max_workers=1) as executor:
+				result = executor.submit(self.run_in_worker(transition_to_picking, self.invoice.name)).result(
+					timeout=5
+				)
+		finally:
+			frappe.db.rollback()
+
+		self.assertFalse(result["ok"])
+		self.assertIn(f"already claimed by {frappe.session.user}", result["msg"])
+
+	def test_parallel_scans_claim_the_invoice_once(self):
+		with ThreadPoolExecutor(max_workers=4) as executor:
+			futures = [
+				executor.submit(self.run_in_worker(transition_to_picking, self.invoice.name))
+				for _ in range(4)
+			]
+			results = [future.result(timeout=30) for future in futures]
+
+		self.assertEqual(sum(result["ok"] for result in results), 1)
+		for result in results:
+			if not result["ok"]:
+				self.assertIn("already claimed by", result["msg"])
+		self.assertEqual(frappe.db.get_value("Sales Invoice", self.invoice.name, "workflow_state"), "Picking")
+
+	def test_claim_document_raises_for_a_locked_row(self):
+		def claim():
+			try:
+				claim_document("Sales Invoice", self.invoice.name, ["workflow_state"])
+			except DocumentClaimedError as e:
+				return e
+
+		claim_document("Sales Invoice", self.invoice.name, ["workflow_state"])
+		try:
+			with ThreadPoolExecutor(max_workers=1) as executor:
+				error = executor.submit(self.run_in_worker(claim)).result(timeout=5)
+		finally:
+			frappe.db.rollback()
+
+		self.assertIsInstance(error, DocumentClaimedError)
+		self.assertEqual(error.holder, frappe.session.user)
@@ -0,0 +1,97 @@
+import frappe
+from frappe import _
+
+# Resolved additional-price accounts per (invoice company, currency), cached in a
+# Redis hash (and per request by frappe.cache) and dropped whenever Medis
+# Settings or a Company changes.
+ADDITIONAL_PRICE_ACCOUNTS_CACHE = "medis:additional_price_accounts"
+
+
+def get_additional_price_accounts(company, currency):
+	"""
+	Return the posting company, its currency, default cost center and the
+	receivable/sales/expense accounts for an invoice of `company` in `currency`.
+	"""
+	accounts = frappe.cache().hget(
+		ADDITIONAL_PRICE_ACCOUNTS_CACHE,
+		f"{company}::{currency}",
+		generator=lambda: _resolve_additional_price_accounts(company, currency),
+	)
+	if not accounts:
+		frappe.throw(
+			_(
+				"No account mapping configured for currency {0}. Please configure accounts for this currency in {1}."
+			).format(currency, frappe.bold("Medis Settings"))
+		)
+	return frappe._dict(accounts)
+
+
+def clear_additional_price_accounts(doc=None, method=None):
+	"""
+	Medis Settings / Company on_update hook. Cleared again once the transaction
+	ends, as a read in between may have cached the old accounts (or, before a
+	rollback, ones that were never saved).
+	"""
+
+	def clear():
+		frappe.cache().delete_key(ADDITIONAL_PRICE_ACCOUNTS_CACHE)
+
+	clear()
+	frappe.db.after_commit.add(clear)
+	frappe.db.after_rollback.add(clear)
+
+
+def _resolve_additional_price_accounts(company, currency):
+	settings = frappe.get_cached_doc("Medis Settings")
+	posting_company = settings.additional_price_company or company
+	row = next(
+		(
+			row
+			for row in settings.additional_price_accounts
+			if row.company == posting_company and row.currency == currency
+		),
+		None,
+	)
+	if not row:
+		return None
+
+	return {
+		"company": posting_company,
+		"company_currency": frappe.get_cached_value("Company", posting_company, "default_currency"),
+		"receivable": row.receivable_account,
+		"sales": row.sales_account,
+		"expense": row.expense_account,
+		"cost_center": row.cost_center or get_default_cost_center(posting_company),
+	}
+
+
+def get_default_cost_center(company):
+	"""Get default cost center from Company master"""
+	# First try to get from Company master
+	default_cost_center = frappe.db.get_value("Company", company, "cost_center")
+
+	if default_cost_center:
+		return default_cost_center
+
+	# If not set in Company, try to find the main cost center for the company
+	cost_centers = frappe.get_all(
+		"Cost Center",
+		filters={"company": company, "is_group": 0},
+		fields=["name"],
+		order_by="creation asc",
+		limit_page_length=1,
+	)
+
+	if cost_centers:
+		return cost_centers[0].name
+
+	# If still not found, try to find any cost center for the company
+	cost_centers = frappe.get_all(
+		"Cost Center", filters={"company": company}, fields=["name"], limit_page_length=1
+	)
+
+	if cost_centers:
+		return cost_centers[0].name
+
+	# Last resort - return None and let ERPNext handle it
+	return None
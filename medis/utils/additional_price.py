@@ -0,0 +1,198 @@
+import frappe
+from frappe import _
+from frappe.utils import flt, getdate, today
+
+ADDITIONAL_PRICE_ENTRY = "Additional Price Entry"
+CONSOLIDATED_DAILY = "Consolidated Daily"
+
+
+def is_consolidated_posting():
+	return frappe.get_cached_doc("Medis Settings").additional_price_posting == CONSOLIDATED_DAILY
+
+
+def append_additional_price_rows(
+	journal_entry, receivable_account, account, customer, currency, amount, base_amount, cost_center, remark
+):
+	"""
+	Append the receivable / sales-or-expense pair for `amount` to `journal_entry`.
+	A positive amount debits the customer, a negative one credits it.
+	"""
+	amount, base_amount = flt(amount), flt(base_amount)
+	debit, credit = (amount, 0) if amount > 0 else (0, -amount)
+	base_debit, base_credit = (base_amount, 0) if amount > 0 else (0, -base_amount)
+	common = {
+		"account_currency": currency,
+		"exchange_rate": base_amount / amount,
+		"cost_center": cost_center,
+		"user_remark": remark,
+	}
+
+	journal_entry.append(
+		"accounts",
+		{
+			"account": receivable_account,
+			"party_type": "Customer",
+			"party": customer,
+			"debit_in_account_currency": debit,
+			"credit_in_account_currency": credit,
+			"debit": base_debit,
+			"credit": base_credit,
+			**common,
+		},
+	)
+	journal_entry.append(
+		"accounts",
+		{
+			"account": account,
+			"debit_in_account_currency": credit,
+			"credit_in_account_currency": debit,
+			"debit": base_credit,
+			"credit": base_debit,
+			**common,
+		},
+	)
+
+
+def record_additional_price_entry(invoice, accounts, account, amount, exchange_rate, cost_center):
+	"""Store the adjustment of a submitted invoice for the daily consolidated posting."""
+	frappe.get_doc(
+		{
+			"doctype": ADDITIONAL_PRICE_ENTRY,
+			"invoice": invoice.name,
+			"customer": invoice.customer,
+			"posting_date": invoice.posting_date,
+			"company": accounts.company,
+			"currency": invoice.currency,
+			"amount": amount,
+			"base_amount": flt(amount) * flt(exchange_rate),
+			"receivable_account": accounts.receivable,
+			"account": account,
+			"cost_center": cost_center,
+		}
+	).insert(ignore_permissions=True)
+
+
+def cancel_additional_price_entries(invoice):
+	"""
+	Undo the adjustments of a cancelled invoice: entries not posted yet are
+	deleted, posted ones get a reversing entry dated today.
+	"""
+	entries = frappe.get_all(
+		ADDITIONAL_PRICE_ENTRY,
+		filters={"invoice": invoice, "reversal_of": ["is", "not set"]},
+		fields=["*"],
+	)
+	for entry in entries:
+		if not entry.journal_entry:
+			frappe.delete_doc(ADDITIONAL_PRICE_ENTRY, entry.name, ignore_permissions=True)
+			continue
+
+		frappe.get_doc(
+			{
+				"doctype": ADDITIONAL_PRICE_ENTRY,
+				"invoice": entry.invoice,
+				"customer": entry.customer,
+				"posting_date": today(),
+				"company": entry.company,
+				"currency": entry.currency,
+				"amount": -flt(entry.amount),
+				"base_amount": -flt(entry.base_amount),
+				"receivable_account": entry.receivable_account,
+				"account": entry.account,
+				"cost_center": entry.cost_center,
+				"reversal_of": entry.name,
+			}
+		).insert(ignore_permissions=True)
+
+
+def post_additional_price_entries(posting_date=None):
+	"""
+	Daily scheduler job. Posts every unposted adjustment dated before
+	`posting_date` (today by default) as one Journal Entry per company, currency,
+	customer and day, and links the entries to it for drill-down.
+	"""
+	entries = frappe.get_all(
+		ADDITIONAL_PRICE_ENTRY,
+		filters={"journal_entry": ["is", "not set"], "posting_date": ["<", getdate(posting_date or today())]},
+		fields=[
+			"name",
+			"invoice",
+			"company",
+			"currency",
+			"customer",
+			"posting_date",
+			"amount",
+			"base_amount",
+			"receivable_account",
+			"account",
+			"cost_center",
+		],
+		order_by="posting_date asc, creation asc",
+	)
+
+	groups = {}
+	for entry in entries:
+		groups.setdefault((entry.company, entry.currency, entry.customer, entry.posting_date), []).append(
+			entry
+		)
+
+	for (company, currency, customer, posting_date), group in groups.items():
+		try:
+			journal_entry = make_consolidated_journal_entry(company, currency, customer, posting_date, group)
+			if journal_entry:
+				frappe.db.set_value(
+					ADDITIONAL_PRICE_ENTRY,
+					{"name": ["in", [entry.name for entry in group]]},
+					"journal_entry",
+					journal_entry.name,
+					update_modified=False,
+				)
+			frappe.db.commit()
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(
+				title="Additional Price Posting Error",
+				message=f"{company} / {currency} / {customer} / {posting_date}\n{frappe.get_traceback()}",
+			)
+
+
+def make_consolidated_journal_entry(company, currency, customer, posting_date, entries):
+	"""Submit one Journal Entry for `entries`, netted per account pair and cost center."""
+	totals = {}
+	for entry in entries:
+		key = (entry.receivable_account, entry.account, entry.cost_center)
+		amount, base_amount = totals.get(key, (0, 0))
+		totals[key] = (amount + flt(entry.amount), base_amount + flt(entry.base_amount))
+
+	invoices = sorted({entry.invoice for entry in entries})
+
+	journal_entry = frappe.new_doc("Journal Entry")
+	journal_entry.voucher_type = "Journal Entry"
+	journal_entry.posting_date = posting_date
+	journal_entry.company = company
+	journal_entry.user_remark = _("Consolidated additional price adjustments for {0} on {1}: {2}").format(
+		customer, frappe.format(posting_date, "Date"), ", ".join(invoices)
+	)
+	if currency != frappe.get_cached_value("Company", company, "default_currency"):
+		journal_entry.multi_currency = 1
+
+	for (receivable_account, account, cost_center), (amount, base_amount) in totals.items():
+		if flt(amount, 9):
+			append_additional_price_rows(
+				journal_entry,
+				receivable_account,
+				account,
+				customer,
+				currency,
+				amount,
+				base_amount,
+				cost_center,
+				_("Additional price adjustments - {0}").format(frappe.format(posting_date, "Date")),
+			)
+
+	if not journal_entry.accounts:
+		return None
+
+	journal_entry.insert(ignore_permissions=True)
+	journal_entry.submit()
+	return journal_entry
@@ -0,0 +1,175 @@
+import pickle
+import time
+from collections import OrderedDict
+
+import frappe
+
+# barcode -> [item_code, item_name] for every Item Barcode, kept in a Redis hash
+# that is built once and then updated by the Item doc events. Each process also
+# keeps recent lookups in an LRU, valid while the index version is unchanged.
+BARCODE_INDEX_CACHE = "medis:barcode_index"
+BARCODE_INDEX_VERSION = "medis:barcode_index:version"
+BARCODE_INDEX_BUILD_LOCK = "medis:barcode_index:build"
+BARCODE_INDEX_LRU_SIZE = 4096
+# How long a process trusts the index version it last read, so LRU hits need
+# no Redis round trip; changes from other processes show up after at most this
+BARCODE_INDEX_VERSION_TTL = 5
+
+_barcode_index_lru = OrderedDict()
+# site -> (version, monotonic time it was read)
+_barcode_index_versions = {}
+
+
+def get_item_by_barcode(barcode):
+	"""Return [item_code, item_name] for `barcode`, or None when no Item has it."""
+	barcode = (barcode or "").strip()
+	version = get_barcode_index_version()
+	key = (frappe.local.site, barcode)
+
+	cached = _barcode_index_lru.get(key)
+	if cached and cached[0] == version:
+		_barcode_index_lru.move_to_end(key)
+		return cached[1]
+
+	item = frappe.cache().hget(BARCODE_INDEX_CACHE, barcode)
+	_barcode_index_lru[key] = (version, item)
+	_barcode_index_lru.move_to_end(key)
+	if len(_barcode_index_lru) > BARCODE_INDEX_LRU_SIZE:
+		_barcode_index_lru.popitem(last=False)
+	return item
+
+
+def get_barcode_index():
+	"""Return the whole index as {barcode: [item_code, item_name]}."""
+	get_barcode_index_version()
+	return {
+		frappe.safe_decode(barcode): item
+		for barcode, item in frappe.cache().hgetall(BARCODE_INDEX_CACHE).items()
+	}
+
+
+def get_barcode_index_version():
+	"""Current index version; builds the index first if Redis does not have it."""
+	cached = _barcode_index_versions.get(frappe.local.site)
+	if cached and time.monotonic() - cached[1] < BARCODE_INDEX_VERSION_TTL:
+		return cached[0]
+
+	version = frappe.cache().get_value(BARCODE_INDEX_VERSION)
+	if not version:
+		with _build_lock():
+			# another request may have built it while this one waited for the lock
+			version = frappe.cache().get_value(BARCODE_INDEX_VERSION) or _build_barcode_index()
+	return _remember_version(version)
+
+
+def build_barcode_index():
+	"""Load every Item Barcode in one query. Also runs after migrate."""
+	with _build_lock():
+		return _build_barcode_index()
+
+
+def _build_barcode_index():
+	item = frappe.qb.DocType("Item")
+	item_barcode = frappe.qb.DocType("Item Barcode")
+	rows = (
+		frappe.qb.from_(item_barcode)
+		.join(item)
+		.on(item.name == item_barcode.parent)
+		.select(item_barcode.barcode, item.name, item.item_name)
+		.where(item_barcode.parenttype == "Item")
+		.run()
+	)
+
+	# fill a temporary hash and swap it in, so lookups never see a partial index;
+	# values are pickled like frappe.cache().hset does
+	cache = frappe.cache()
+	key = cache.make_key(BARCODE_INDEX_CACHE)
+	building_key = cache.make_key(f"{BARCODE_INDEX_CACHE}:building")
+	pipe = cache.pipeline()
+	pipe.delete(building_key)
+	if rows:
+		pipe.hset(
+			building_key,
+			mapping={
+				barcode.strip(): pickle.dumps([item_code, item_name])
+				for barcode, item_code, item_name in rows
+			},
+		)
+		pipe.rename(building_key, key)
+	else:
+		pipe.delete(key)
+	pipe.execute()
+	return _bump_barcode_index_version()
+
+
+def update_barcode_index(doc, method=None):
+	"""Item on_update hook: replace the entries of `doc` with its current barcodes."""
+	if not frappe.cache().get_value(BARCODE_INDEX_VERSION):
+		return
+
+	doc_before_save = doc.get_doc_before_save()
+	old_barcodes = {row.barcode.strip() for row in (doc_before_save.barcodes if doc_before_save else [])}
+	new_barcodes = {row.barcode.strip() for row in doc.barcodes}
+	if old_barcodes == new_barcodes and not doc.has_value_changed("item_name"):
+		return
+
+	item_code, item_name = doc.name, doc.item_name
+
+	def update():
+		for barcode in old_barcodes - new_barcodes:
+			frappe.cache().hdel(BARCODE_INDEX_CACHE, barcode)
+		for barcode in new_barcodes:
+			frappe.cache().hset(BARCODE_INDEX_CACHE, barcode, [item_code, item_name])
+		_bump_barcode_index_version()
+
+	# only what was saved goes in the index
+	frappe.db.after_commit.add(update)
+
+
+def remove_from_barcode_index(doc, method=None):
+	"""Item on_trash hook."""
+	if not frappe.cache().get_value(BARCODE_INDEX_VERSION):
+		return
+
+	barcodes = [row.barcode.strip() for row in doc.barcodes]
+
+	def remove():
+		for barcode in barcodes:
+			frappe.cache().hdel(BARCODE_INDEX_CACHE, barcode)
+		_bump_barcode_index_version()
+
+	frappe.db.after_commit.add(remove)
+
+
+def clear_barcode_index(doc=None, method=None, *args, **kwargs):
+	"""
+	Item after_rename hook, applied once the rename commits; at once when called
+	without a document. The index is rebuilt on the next lookup.
+	"""
+	if doc:
+		frappe.db.after_commit.add(_clear_barcode_index)
+	else:
+		_clear_barcode_index()
+
+
+def _clear_barcode_index():
+	frappe.cache().delete_value(BARCODE_INDEX_VERSION)
+	frappe.cache().delete_key(BARCODE_INDEX_CACHE)
+	_barcode_index_versions.pop(frappe.local.site, None)
+
+
+def _bump_barcode_index_version():
+	version = frappe.generate_hash(length=10)
+	frappe.cache().set_value(BARCODE_INDEX_VERSION, version)
+	return _remember_version(version)
+
+
+def _remember_version(version):
+	_barcode_index_versions[frappe.local.site] = (version, time.monotonic())
+	return version
+
+
+def _build_lock():
+	return frappe.cache().lock(
+		frappe.cache().make_key(BARCODE_INDEX_BUILD_LOCK), timeout=120, blocking_timeout=60
+	)
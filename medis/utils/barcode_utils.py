@@ -1,38 +1,262 @@
-import frappe
-import barcode
-from barcode.writer import ImageWriter
-from io import BytesIO
 import base64
-from PIL import Image
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import repeat
+
+import barcode
+import frappe
+from barcode.writer import ImageWriter, SVGWriter
+from PIL import Image, ImageChops
+
+BARCODE_OPTIONS = {
+    "module_width": 0.15,   # narrower bars
+    "module_height": 5,    # shorter height
+    "quiet_zone": 1,        # less margin
+    "font_size": 1,         # no text
+    "text_distance": 0,
+    "background": "white",
+    "foreground": "black",
+    "write_text": False,
+}
+
+# SVG output draws only the bars; the background is left out entirely
+SVG_OPTIONS = {
+    **BARCODE_OPTIONS,
+    "background": None,
+    "compress": True,
+    "with_doctype": False,
+}
+
+OUTPUT_FORMATS = ("png", "svg")
+
+SVG_SIZE_RE = re.compile(r'<svg[^>]* width="([\d.]+)mm" height="([\d.]+)mm"')
+SVG_RECT_RE = re.compile(r'<rect x="([\d.]+)mm" y="([\d.]+)mm" width="([\d.]+)mm" height="([\d.]+)mm"')
+
+# Rendered barcodes are cached in two tiers: a small per-process LRU and Redis,
+# both keyed by a hash of everything that affects the image.
+BARCODE_CACHE_PREFIX = "medis:barcode:"
+BARCODE_CACHE_TTL = 7 * 24 * 60 * 60
+BARCODE_LRU_SIZE = 1024
+
+# Maps a channel value to 255 when it is "white enough" (> 240), else 0
+WHITE_LUT = [0] * 241 + [255] * 15
+
+# Batches with more uncached barcodes than this are rendered by a background
+# job, across a process pool
+BATCH_POOL_THRESHOLD = 50
+BATCH_POOL_MAX_WORKERS = 4
+# Most docnames one generate_barcodes call accepts
+BATCH_MAX_SIZE = 500
+
+_barcode_lru = OrderedDict()
+
+
 @frappe.whitelist()
 def generate_barcode(*args, **kwargs):
+    """
+    Return the barcode for `docname` as a PNG data URI or, with
+    `output_format="svg"`, as inline SVG markup. When no format is passed the
+    site config key `medis_barcode_format` decides, falling back to PNG.
+    """
     # Remove unwanted * before generating
     docname = (kwargs.get("docname") or args[0]).replace("*", "")
+    output_format = get_output_format(kwargs.get("output_format"))
+    key = get_barcode_cache_key(docname, output_format)
+
+    image = get_cached_barcode(key)
+    if not image:
+        image = render_barcode(docname, output_format)
+        set_cached_barcode(key, image)
+    return image
+
+
+@frappe.whitelist()
+def generate_barcodes(docnames, output_format=None):
+    """
+    Return {docname: barcode} for a list of Sales Invoice names in one call, e.g.
+    to pre-warm a print run. Cached barcodes are reused. When more than
+    BATCH_POOL_THRESHOLD of them are not cached, those are left out of the
+    result and rendered by a background job: a later call finds them cached.
+    """
+    if isinstance(docnames, str):
+        docnames = frappe.parse_json(docnames)
+    if len(docnames) > BATCH_MAX_SIZE:
+        frappe.throw(frappe._("At most {0} barcodes can be generated at once").format(BATCH_MAX_SIZE))
+    output_format = get_output_format(output_format)
+    codes = {docname: str(docname).replace("*", "") for docname in docnames}
+    _check_read_permission(set(codes.values()))
+
+    barcodes = {}
+    missing = {}
+    for docname, code in codes.items():
+        key = get_barcode_cache_key(code, output_format)
+        image = get_cached_barcode(key)
+        if image:
+            barcodes[docname] = image
+        else:
+            missing[docname] = (code, key)
+
+    if len(missing) > BATCH_POOL_THRESHOLD:
+        codes = sorted({code for code, _key in missing.values()})
+        batch = hashlib.sha1(json.dumps([output_format, codes]).encode()).hexdigest()[:16]
+        frappe.enqueue(
+            "medis.utils.barcode_utils.cache_barcodes",
+            queue="long",
+            job_id=f"medis-barcodes::{batch}",
+            deduplicate=True,
+            codes=codes,
+            output_format=output_format,
+        )
+        return barcodes
+
+    for docname, (code, key) in missing.items():
+        image = render_barcode(code, output_format)
+        set_cached_barcode(key, image)
+        barcodes[docname] = image
+
+    return barcodes
+
+
+def cache_barcodes(codes, output_format):
+    """Background job of generate_barcodes: render and cache a large batch."""
+    for code, image in zip(codes, _render_many(codes, output_format), strict=True):
+        set_cached_barcode(get_barcode_cache_key(code, output_format), image)
+
+
+def _check_read_permission(names):
+    """Throw unless the session user can read every Sales Invoice in `names`."""
+    readable = set(
+        frappe.get_list(
+            "Sales Invoice", filters={"name": ["in", list(names)]}, pluck="name", limit_page_length=0
+        )
+    )
+    denied = sorted(names - readable)
+    if denied:
+        frappe.throw(frappe._("Not permitted to read {0}").format(", ".join(denied)), frappe.PermissionError)
+
+
+def get_cached_barcode(key):
+    image = _lru_get(key)
+    if not image:
+        image = frappe.cache().get_value(key)
+        if image:
+            _lru_set(key, image)
+    return image
+
+
+def set_cached_barcode(key, image):
+    frappe.cache().set_value(key, image, expires_in_sec=BARCODE_CACHE_TTL)
+    _lru_set(key, image)
+
+
+def _render_many(codes, output_format):
+    """Render in a process pool; only ever from a background job, never in a web request."""
+    if len(codes) <= BATCH_POOL_THRESHOLD:
+        return [render_barcode(code, output_format) for code in codes]
+
+    workers = min(BATCH_POOL_MAX_WORKERS, os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                render_barcode, codes, repeat(output_format), chunksize=max(1, len(codes) // (workers * 4))
+            )
+        )
+
+
+def get_output_format(output_format=None):
+    output_format = (output_format or frappe.conf.get("medis_barcode_format") or "png").lower()
+    if output_format not in OUTPUT_FORMATS:
+        frappe.throw(frappe._("Unsupported barcode format {0}").format(output_format))
+    return output_format
+
+
+def get_barcode_cache_key(docname, output_format="png"):
+    """Content-addressed cache key for a rendered barcode."""
+    options = SVG_OPTIONS if output_format == "svg" else BARCODE_OPTIONS
+    payload = json.dumps(
+        {"docname": docname, "format": output_format, "options": options}, sort_keys=True
+    )
+    return BARCODE_CACHE_PREFIX + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def render_barcode(docname, output_format="png"):
+    if output_format == "svg":
+        return render_barcode_svg(docname)
+    return render_barcode_png(docname)
+
+
+def render_barcode_svg(docname):
+    """
+    Render a Code128 barcode as compact inline SVG markup. The bars drawn by
+    SVGWriter are folded into a single path with a viewBox in millimetres, so
+    the print format can scale it with CSS like the PNG.
+    """
     CODE128 = barcode.get_barcode_class("code128")
     buffer = BytesIO()
-    options = {
-        "module_width": 0.15,   # narrower bars
-        "module_height": 5,    # shorter height
-        "quiet_zone": 1,        # less margin
-        "font_size": 1,         # no text
-        "text_distance": 0,
-        "background": "white",
-        "foreground": "black",
-        "write_text":False
-    }
-    CODE128(docname, writer=ImageWriter()).write(buffer, options)
-    # Convert to transparent background
+    CODE128(docname, writer=SVGWriter()).write(buffer, SVG_OPTIONS)
+
+    markup = buffer.getvalue().decode()
+    width, height = SVG_SIZE_RE.search(markup).groups()
+    path = "".join(
+        f"M{_svg_number(x)} {_svg_number(y)}h{_svg_number(w)}v{_svg_number(h)}h-{_svg_number(w)}z"
+        for x, y, w, h in SVG_RECT_RE.findall(markup)
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_svg_number(width)} {_svg_number(height)}"'
+        f' width="{width}mm" height="{height}mm"><path d="{path}" fill="{BARCODE_OPTIONS["foreground"]}"/></svg>'
+    )
+
+
+def _svg_number(value):
+    """Shortest form of a writer coordinate: "0.150" -> ".15", "1.000" -> "1"."""
+    value = value.rstrip("0").rstrip(".") or "0"
+    return value[1:] if value.startswith("0.") else value
+
+
+def render_barcode_png(docname):
+    """Render a Code128 barcode as a PNG data URI with a transparent background."""
+    CODE128 = barcode.get_barcode_class("code128")
+    buffer = BytesIO()
+    CODE128(docname, writer=ImageWriter()).write(buffer, BARCODE_OPTIONS)
+
     buffer.seek(0)
-    img = Image.open(buffer).convert("RGBA")
-    datas = img.getdata()
-    newData = []
-    for item in datas:
-        if item[0] > 240 and item[1] > 240 and item[2] > 240:
-            newData.append((255, 255, 255, 0))  # transparent
-        else:
-            newData.append(item)
-    img.putdata(newData)
+    img = make_background_transparent(Image.open(buffer))
+
     buffer_out = BytesIO()
     img.save(buffer_out, format="PNG")
     encoded = base64.b64encode(buffer_out.getvalue()).decode()
     return f"data:image/png;base64,{encoded}"
+
+
+def make_background_transparent(img):
+    """
+    Make every near-white pixel (all channels above 240) fully transparent.
+    Works on whole channels instead of looping over pixels in Python.
+    """
+    img = img.convert("RGBA")
+    red, green, blue, _alpha = img.split()
+    white_mask = ImageChops.multiply(
+        ImageChops.multiply(red.point(WHITE_LUT), green.point(WHITE_LUT)),
+        blue.point(WHITE_LUT),
+    )
+    img.paste((255, 255, 255, 0), mask=white_mask)
+    return img
+
+
+def _lru_get(key):
+    image = _barcode_lru.get(key)
+    if image:
+        _barcode_lru.move_to_end(key)
+    return image
+
+
+def _lru_set(key, image):
+    _barcode_lru[key] = image
+    _barcode_lru.move_to_end(key)
+    while len(_barcode_lru) > BARCODE_LRU_SIZE:
+        _barcode_lru.popitem(last=False)
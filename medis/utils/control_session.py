@@ -0,0 +1,155 @@
+import frappe
+
+# Control sessions live in Redis, one per invoice being controlled, so a reload
+# or a second station resumes where the first left off:
+#   <prefix><invoice>:expected  {item_code: [qty, item_name]} from the invoice
+#   <prefix><invoice>:scanned   raw hash item_code -> scanned count (HINCRBY)
+#   <prefix><invoice>:names     raw hash item_code -> item_name of scanned items
+CONTROL_SESSION_PREFIX = "medis:control_session:"
+CONTROL_SESSION_TTL = 24 * 60 * 60
+
+# Order the comparison lists rows in: problems first
+ROW_STATUS_ORDER = {"extra": 0, "mismatch": 1, "missing": 2, "ok": 3}
+
+
+def start_control_session(invoice, items):
+	"""
+	Store the expected quantities of `items` (rows with item_code, item_name and
+	qty) unless a session for `invoice` is already running, and return it.
+	"""
+	expected = get_expected(invoice)
+	if expected is None:
+		expected = {}
+		for item in items:
+			qty, item_name = expected.get(item.item_code, (0, item.item_name))
+			expected[item.item_code] = [qty + (item.qty or 0), item_name]
+		frappe.cache().set_value(_key(invoice, "expected"), expected, expires_in_sec=CONTROL_SESSION_TTL)
+	return get_control_session(invoice, expected)
+
+
+def get_expected(invoice):
+	return frappe.cache().get_value(_key(invoice, "expected"))
+
+
+def get_control_session(invoice, expected=None):
+	"""Every row of the session with its status, plus the summary."""
+	expected = expected if expected is not None else get_expected(invoice)
+	scanned, names = _read_scanned(invoice)
+	return _make_session(expected or {}, scanned, names)
+
+
+def record_scans(invoice, items):
+	"""
+	Add one scan per entry of `items` ([item_code, item_name] pairs, repeated for
+	repeated scans) in a single Redis round trip. Returns the rows that changed
+	and the updated summary.
+	"""
+	counts = {}
+	for item_code, item_name in items:
+		count, _ = counts.get(item_code, (0, item_name))
+		counts[item_code] = (count + 1, item_name)
+
+	pipe = frappe.cache().pipeline()
+	for item_code, (count, item_name) in counts.items():
+		pipe.hincrby(_raw_key(invoice, "scanned"), item_code, count)
+		pipe.hset(_raw_key(invoice, "names"), item_code, item_name or "")
+	_read_scanned(invoice, pipe)
+	scanned, names = _parse_scanned(pipe.execute())
+
+	return _make_session(get_expected(invoice) or {}, scanned, names, item_codes=counts)
+
+
+def set_scanned_qty(invoice, item_code, qty, item_name=None):
+	"""Overwrite the scanned count of `item_code`; 0 removes it from the session."""
+	pipe = frappe.cache().pipeline()
+	if qty > 0:
+		pipe.hset(_raw_key(invoice, "scanned"), item_code, qty)
+		if item_name:
+			pipe.hset(_raw_key(invoice, "names"), item_code, item_name)
+	else:
+		pipe.hdel(_raw_key(invoice, "scanned"), item_code)
+	_read_scanned(invoice, pipe)
+	scanned, names = _parse_scanned(pipe.execute())
+
+	return _make_session(get_expected(invoice) or {}, scanned, names, item_codes=[item_code])
+
+
+def clear_scanned(invoice):
+	"""Forget every scan but keep the session running."""
+	frappe.cache().delete(_raw_key(invoice, "scanned"), _raw_key(invoice, "names"))
+
+
+def end_control_session(invoice):
+	clear_scanned(invoice)
+	frappe.cache().delete_value(_key(invoice, "expected"))
+
+
+def _make_session(expected, scanned, names, item_codes=None):
+	if item_codes is None:
+		item_codes = {*expected, *scanned}
+
+	rows = []
+	for item_code in item_codes:
+		expected_qty, item_name = expected.get(item_code, (0, names.get(item_code, "")))
+		rows.append(
+			_make_row(item_code, item_name, expected_qty, scanned.get(item_code, 0), item_code in expected)
+		)
+	rows.sort(key=lambda row: ROW_STATUS_ORDER[row["status"]])
+
+	summary = {status: 0 for status in ROW_STATUS_ORDER}
+	for item_code in {*expected, *scanned}:
+		expected_qty = expected[item_code][0] if item_code in expected else 0
+		summary[_get_status(expected_qty, scanned.get(item_code, 0), item_code in expected)] += 1
+	summary["complete"] = bool(expected) and summary["ok"] == len(expected) and not summary["extra"]
+
+	return {"rows": rows, "summary": summary}
+
+
+def _make_row(item_code, item_name, expected_qty, scanned_qty, is_expected):
+	return {
+		"item_code": item_code,
+		"item_name": item_name,
+		"expected": expected_qty,
+		"scanned": scanned_qty,
+		"status": _get_status(expected_qty, scanned_qty, is_expected),
+	}
+
+
+def _get_status(expected_qty, scanned_qty, is_expected):
+	if not is_expected:
+		return "extra"
+	if not scanned_qty:
+		return "missing"
+	return "ok" if scanned_qty == expected_qty else "mismatch"
+
+
+def _read_scanned(invoice, pipe=None):
+	"""Queue the reads of the session's scans on `pipe`, or read them right away."""
+	execute = pipe is None
+	pipe = pipe or frappe.cache().pipeline()
+	pipe.hgetall(_raw_key(invoice, "scanned"))
+	pipe.hgetall(_raw_key(invoice, "names"))
+	# keep the session alive while it is being worked on
+	for field in ("scanned", "names"):
+		pipe.expire(_raw_key(invoice, field), CONTROL_SESSION_TTL)
+	if execute:
+		return _parse_scanned(pipe.execute())
+
+
+def _parse_scanned(results):
+	# the last four results are the ones queued by _read_scanned
+	scanned, names = results[-4], results[-3]
+	return (
+		{frappe.safe_decode(code): int(count) for code, count in scanned.items()},
+		{frappe.safe_decode(code): frappe.safe_decode(name) for code, name in names.items()},
+	)
+
+
+def _key(invoice, field):
+	return f"{CONTROL_SESSION_PREFIX}{invoice}:{field}"
+
+
+def _raw_key(invoice, field):
+	# hashes touched with HINCRBY bypass frappe.cache's pickling, so they need
+	# the site-prefixed key themselves
+	return frappe.cache().make_key(_key(invoice, field))
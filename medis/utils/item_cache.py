@@ -0,0 +1,66 @@
+import pickle
+
+import frappe
+
+# Item attributes used to classify invoice lines, cached per item code in a Redis
+# hash and dropped whenever the Item changes.
+ITEM_ATTRIBUTES_CACHE = "medis:item_attributes"
+ITEM_ATTRIBUTE_FIELDS = (
+	"custom_medication_type",
+	"custom_medication_category",
+	"custom_storage_type",
+	"custom_temperature",
+)
+
+
+def get_item_attributes(item_codes):
+	"""
+	Return {item_code: attributes} for the distinct `item_codes`. Cached codes are
+	served from Redis, the rest are fetched together in a single query.
+	"""
+	item_codes = list({code for code in item_codes if code})
+	if not item_codes:
+		return {}
+
+	# one HMGET for every code; values are pickled like frappe.cache().hset does
+	cache = frappe.cache()
+	cache_key = cache.make_key(ITEM_ATTRIBUTES_CACHE)
+	attributes = {}
+	missing = []
+	for item_code, cached in zip(item_codes, cache.hmget(cache_key, item_codes), strict=True):
+		if cached is None:
+			missing.append(item_code)
+		else:
+			attributes[item_code] = pickle.loads(cached)
+
+	if missing:
+		fetched = {}
+		for row in frappe.get_all(
+			"Item", filters={"name": ["in", missing]}, fields=["name", *ITEM_ATTRIBUTE_FIELDS]
+		):
+			item_code = row.pop("name")
+			attributes[item_code] = fetched[item_code] = row
+		if fetched:
+			# the raw client: frappe's hset takes a single field
+			pipe = cache.pipeline()
+			pipe.hset(cache_key, mapping={code: pickle.dumps(row) for code, row in fetched.items()})
+			pipe.execute()
+
+	return attributes
+
+
+def clear_item_attributes(doc, method=None, old=None, new=None, merge=None):
+	"""
+	Item on_update / on_trash / after_rename hook. Cleared again once the
+	transaction ends, as a read in between may have cached the old attributes
+	(or, before a rollback, ones that were never saved).
+	"""
+	item_codes = [doc.name, old] if old else [doc.name]
+
+	def clear():
+		for item_code in item_codes:
+			frappe.cache().hdel(ITEM_ATTRIBUTES_CACHE, item_code)
+
+	clear()
+	frappe.db.after_commit.add(clear)
+	frappe.db.after_rollback.add(clear)
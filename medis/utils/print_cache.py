@@ -0,0 +1,82 @@
+import base64
+import hashlib
+
+import frappe
+
+INVOICE_PRINT_FORMAT = "Medis Split Invoice"
+
+# Rendered invoice PDFs are cached per (invoice, print version), so any change to
+# what is printed makes the previous render unreachable; the TTL cleans it up.
+INVOICE_PDF_CACHE_PREFIX = "medis:invoice_pdf:"
+INVOICE_PDF_CACHE_TTL = 12 * 60 * 60
+# Set by the warehouse workflow and left out of the print version, so moving an
+# invoice from Ready For Picking to Controlling still reprints from the cache
+WORKFLOW_ONLY_FIELDS = (
+	"workflow_state",
+	"status",
+	"custom_picker",
+	"custom_controller",
+	"custom_first_attempt_miss",
+	"custom_packs",
+	"custom_pending_split",
+	"custom_split_children",
+)
+
+
+def on_sales_invoice_update(doc, method=None):
+	"""Pre-render the invoice PDF in the background once it becomes Ready For Picking."""
+	if doc.workflow_state != "Ready For Picking" or not doc.has_value_changed("workflow_state"):
+		return
+	if doc.flags.skip_pdf_prerender:
+		return
+
+	frappe.enqueue(
+		"medis.utils.print_cache.render_invoice_pdf",
+		queue="short",
+		job_id=f"medis-invoice-pdf::{doc.name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		invoice=doc.name,
+	)
+
+
+@frappe.whitelist()
+def get_invoice_pdf(invoice):
+	"""
+	Return the invoice PDF as {"pdf_base64": ...}, the same shape as silent_print's
+	create_pdf. Served from the cache when what it prints has not changed since it
+	was rendered, rendered (and cached) on the spot otherwise.
+	"""
+	frappe.has_permission("Sales Invoice", "print", invoice, throw=True)
+	return {"pdf_base64": render_invoice_pdf(invoice)}
+
+
+def render_invoice_pdf(invoice):
+	if not frappe.db.exists("Sales Invoice", invoice):
+		return
+
+	doc = frappe.get_doc("Sales Invoice", invoice)
+	key = get_invoice_pdf_cache_key(invoice, get_print_version(doc))
+	pdf_base64 = frappe.cache().get_value(key)
+	if pdf_base64:
+		return pdf_base64
+
+	pdf = frappe.get_print(
+		"Sales Invoice", invoice, INVOICE_PRINT_FORMAT, doc=doc, as_pdf=True, no_letterhead=0
+	)
+	pdf_base64 = base64.b64encode(pdf).decode()
+	frappe.cache().set_value(key, pdf_base64, expires_in_sec=INVOICE_PDF_CACHE_TTL)
+	return pdf_base64
+
+
+def get_print_version(doc):
+	"""Digest of the invoice's printed content: its fields and rows, without the workflow-only ones."""
+	content = doc.as_dict(no_default_fields=True)
+	for field in (*WORKFLOW_ONLY_FIELDS, *(field for field in content if field.startswith("_"))):
+		content.pop(field, None)
+	content["docstatus"] = doc.docstatus
+	return hashlib.sha1(frappe.as_json(content).encode(), usedforsecurity=False).hexdigest()
+
+
+def get_invoice_pdf_cache_key(invoice, version):
+	return f"{INVOICE_PDF_CACHE_PREFIX}{invoice}:{version}"
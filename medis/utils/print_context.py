@@ -0,0 +1,41 @@
+import frappe
+
+from medis.utils.barcode_utils import generate_barcode
+
+
+def get_split_invoice_context(doc):
+	"""
+	Everything the "Medis Split Invoice" print format looks up besides the invoice
+	itself, fetched with a fixed number of queries however many item rows it has.
+
+	Exposed to print formats through the `jinja` hook:
+
+		{% set ctx = get_split_invoice_context(doc) %}
+	"""
+	batch_nos = {item.batch_no for item in doc.items if item.get("batch_no")}
+
+	return frappe._dict(
+		customer=_get_record("Customer", doc.customer),
+		address=_get_record("Address", doc.get("customer_address")),
+		batch_expiry=_get_batch_expiry(batch_nos),
+		barcode=generate_barcode(docname=doc.name),
+	)
+
+
+def _get_record(doctype, name):
+	if not name:
+		return frappe._dict()
+	return frappe.db.get_value(doctype, name, "*", as_dict=True) or frappe._dict()
+
+
+def _get_batch_expiry(batch_nos):
+	if not batch_nos:
+		return {}
+	return dict(
+		frappe.get_all(
+			"Batch",
+			filters={"name": ["in", list(batch_nos)]},
+			fields=["name", "expiry_date"],
+			as_list=True,
+		)
+	)
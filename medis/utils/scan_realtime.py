@@ -0,0 +1,35 @@
+import frappe
+
+# Pushed to the stations subscribed to a Sales Invoice when it changes workflow
+# state, so the scanning screens learn about moves made from another station
+INVOICE_STATE_EVENT = "medis_invoice_state"
+# Pushed to the stations subscribed to an invoice when its control session
+# changes: the changed rows and the summary, as the controller endpoints return
+CONTROL_SESSION_EVENT = "medis_control_session"
+
+
+def publish_invoice_state(doc, method=None):
+	"""Sales Invoice on_change hook."""
+	if not doc.has_value_changed("workflow_state"):
+		return
+
+	frappe.publish_realtime(
+		INVOICE_STATE_EVENT,
+		{"invoice": doc.name, "workflow_state": doc.workflow_state, "user": frappe.session.user},
+		doctype="Sales Invoice",
+		docname=doc.name,
+		after_commit=True,
+	)
+
+
+def publish_control_session(invoice, session, station=None):
+	"""
+	Push a control session diff to the stations subscribed to `invoice`.
+	`station` identifies the sender, which already has the diff.
+	"""
+	frappe.publish_realtime(
+		CONTROL_SESSION_EVENT,
+		{"invoice": invoice, "station": station, **session},
+		doctype="Sales Invoice",
+		docname=invoice,
+	)
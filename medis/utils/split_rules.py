@@ -0,0 +1,72 @@
+import frappe
+
+from medis.utils.item_cache import get_item_attributes
+
+# (rule field, Item attribute) pairs a split rule can filter on
+RULE_CONDITIONS = (
+	("medication_type", "custom_medication_type"),
+	("medication_category", "custom_medication_category"),
+	("storage_type", "custom_storage_type"),
+	("temperature", "custom_temperature"),
+)
+
+# Used when Medis Settings has no split rules: the original free medicine split
+DEFAULT_SPLIT_RULES = (
+	frappe._dict(rule_name="Free Medicine", free_items_only=1, medication_type="Medicine"),
+)
+
+
+def get_split_rules():
+	return frappe.get_cached_doc("Medis Settings").split_rules or DEFAULT_SPLIT_RULES
+
+
+def classify_invoice_items(items, rules=None):
+	"""
+	Assign each saved invoice line to the first split rule it matches.
+
+	Returns ({rule_name: [items]}, regular_items) with groups in rule order and
+	empty groups left out. Lines are classified by their (is_free, attributes)
+	signature and each distinct signature is matched against the rules once, so
+	the cost grows with the number of lines, not lines x rules.
+	"""
+	rules = rules or get_split_rules()
+	item_attributes = get_item_attributes(item.item_code for item in items)
+
+	groups = {rule.rule_name: [] for rule in rules}
+	regular_items = []
+	matched_rules = {}
+
+	for item in items:
+		if not item.name:
+			continue
+
+		is_free = bool((item.amount or 0) == 0 or (item.net_amount or 0) == 0)
+		attributes = item_attributes.get(item.item_code) or {}
+		signature = (is_free, *(_normalize(attributes.get(field)) for _, field in RULE_CONDITIONS))
+
+		if signature not in matched_rules:
+			matched_rules[signature] = _find_rule(rules, signature)
+
+		rule = matched_rules[signature]
+		if rule:
+			groups[rule.rule_name].append(item)
+		else:
+			regular_items.append(item)
+
+	return {rule_name: lines for rule_name, lines in groups.items() if lines}, regular_items
+
+
+def _find_rule(rules, signature):
+	is_free, *values = signature
+	for rule in rules:
+		if rule.free_items_only and not is_free:
+			continue
+		if all(
+			not rule.get(rule_field) or _normalize(rule.get(rule_field)) == value
+			for (rule_field, _), value in zip(RULE_CONDITIONS, values, strict=True)
+		):
+			return rule
+
+
+def _normalize(value):
+	return str(value or "").strip()